@@ -0,0 +1,115 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from metrics import REGISTRY, traced
+
+# Flask runs `async def` views only with asgiref installed (pip install "flask[async]")
+try:
+    import asgiref  # noqa: F401
+    ASYNC_VIEWS_AVAILABLE = True
+except ImportError:
+    ASYNC_VIEWS_AVAILABLE = False
+
+DEGRADED = REGISTRY.counter("optgift_degraded_total", "Stages answered by a fallback", ("stage", "reason"))
+
+
+class StageResult:
+    __slots__ = ("value", "degraded", "reason", "seconds")
+
+    def __init__(self, value, degraded=False, reason=None, seconds=0.0):
+        self.value = value
+        self.degraded = degraded
+        self.reason = reason
+        self.seconds = seconds
+
+
+class RecommendationExecutor:
+    """
+    Bounded thread pool for the CPU-heavy recommendation stages (BERT encode, similarity,
+    CF scoring: NumPy and torch release the GIL). gather() runs several stages at once and
+    waits for each up to its own timeout; a stage that times out, fails or finds the pool
+    full is answered by `fallback(name, reason)` instead. Timed-out work is not cancelled:
+    it finishes in the background and fills the result cache for the next request.
+
+    The pool is created lazily in each process (threads do not survive serve.py's fork).
+    """
+
+    def __init__(self, max_workers=4, max_pending=16, name="rec-stage"):
+        self.max_workers = max_workers
+        self.name = name
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix=self.name)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def submit(self, fn):
+        """A Future for fn(), or None when max_pending stages are already queued or running."""
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            # Stage timings recorded in the worker go to the submitting request's trace
+            future = self._executor().submit(traced(fn))
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def _start(self, jobs):
+        return {name: (self.submit(fn) if fn is not None else None, time.perf_counter()) for name, fn in jobs.items()}
+
+    @staticmethod
+    def _degrade(name, reason, fallback, started):
+        DEGRADED.inc(name, reason)
+        return StageResult(fallback(name, reason), True, reason, time.perf_counter() - started)
+
+    def gather(self, jobs, timeouts, fallback):
+        """
+        jobs: {name: fn or None (skip straight to the fallback)}; timeouts: {name: seconds}.
+        Returns {name: StageResult}. Stages run concurrently, so the call takes about the
+        largest timeout at worst.
+        """
+        results = {}
+        for name, (future, started) in self._start(jobs).items():
+            if future is None:
+                results[name] = self._degrade(name, "busy" if jobs[name] else "unavailable", fallback, started)
+                continue
+            remaining = max(0.0, started + timeouts.get(name, 1.0) - time.perf_counter())
+            try:
+                results[name] = StageResult(future.result(timeout=remaining), seconds=time.perf_counter() - started)
+            except FutureTimeout:
+                results[name] = self._degrade(name, "timeout", fallback, started)
+            except Exception as e:
+                print(f"Stage {name} failed, degrading: {e}")
+                results[name] = self._degrade(name, "error", fallback, started)
+        return results
+
+    async def gather_async(self, jobs, timeouts, fallback):
+        """gather() for async views: awaits the stages without blocking the event loop."""
+        started = self._start(jobs)
+
+        async def wait_one(name, future, start):
+            if future is None:
+                return self._degrade(name, "busy" if jobs[name] else "unavailable", fallback, start)
+            try:
+                # shield: a timeout must not cancel the work, it still fills the cache
+                value = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeouts.get(name, 1.0))
+                return StageResult(value, seconds=time.perf_counter() - start)
+            except asyncio.TimeoutError:
+                return self._degrade(name, "timeout", fallback, start)
+            except Exception as e:
+                print(f"Stage {name} failed, degrading: {e}")
+                return self._degrade(name, "error", fallback, start)
+
+        names = list(started)
+        values = await asyncio.gather(*(wait_one(n, *started[n]) for n in names))
+        return dict(zip(names, values))
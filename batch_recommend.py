@@ -0,0 +1,366 @@
+"""
+Nightly batch job: top-N gift recommendations for every user (email / push campaigns).
+
+    python batch_recommend.py --out batch_recs --top-n 20 --workers 4
+    python batch_recommend.py --out batch_recs --resume      # continue an interrupted run
+
+Each user's query comes from their stored preferences. Distinct queries are encoded once,
+in large batches; a process pool then scores chunks of users against the product embeddings
+block by block (content cosine + CF from the per-user factor matrix), keeping a running
+top-N per user, so memory is bounded by chunk size x block size rather than users x products.
+With --rl-weights each block is also re-ranked by every user's RL weights (relevance / price /
+novelty) in the same pass, as the dashboard's "rl" list does.
+Every chunk of user ids is written to its own part file, which is what --resume skips.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# One-shot job: no warm-up or background threads when app is imported
+os.environ.setdefault("OPTGIFT_STARTUP_MODE", "lazy")
+os.environ["OPTGIFT_PREFORK"] = "1"
+
+import numpy as np
+from rl_weights import weight_vector, weighted_scores
+
+DEFAULT_QUERY = "general personalized gifts"
+RUN_FILE = "_run.json"
+FORMATS = ("csv", "parquet")
+
+
+# --- Queries from stored preferences ---
+def preference_query(preferences_json):
+    """The dashboard-style context query for a user's saved preferences."""
+    try:
+        prefs = json.loads(preferences_json) if preferences_json else {}
+    except ValueError:
+        prefs = {}
+    if not isinstance(prefs, dict):
+        prefs = {}
+    parts = []
+    occasion = prefs.get("occasion")
+    if occasion and occasion != "general":
+        # Repeated, as the dashboard does, to weight the occasion
+        parts.append(f"{occasion} {occasion}")
+    interests = [i for i in prefs.get("interests") or [] if isinstance(i, str)]
+    if interests:
+        parts.append(f"interests: {' '.join(interests)}")
+    return " ".join(parts) if parts else DEFAULT_QUERY
+
+
+# --- Scoring (runs in the worker processes) ---
+_worker = {}
+
+
+def _init_worker(state):
+    # Fork start method: the arrays are inherited copy-on-write, not pickled
+    _worker.update(state)
+
+
+def score_chunk(query_vectors, user_factors, user_weights, state, top_n, block_rows):
+    """
+    Top-N catalog rows for each user of a chunk: (rows, scores, content, cf), each users x top_n.
+    Scores = (1 - cf_weight) * cosine + cf_weight * CF confidence, computed one product block
+    at a time and merged into a running top-N. user_weights (users x 3 RL weights, or None)
+    re-weights that relevance against each product's price and novelty scores.
+    """
+    products = state["products"]      # n x d, L2-normalized float32
+    item_factors = state["item_factors"]  # k x n (zero columns for products CF has not seen) or None
+    valid = state["valid"]            # False for repeated product ids (first row wins)
+    cf_weight = state["cf_weight"] if item_factors is not None else 0.0
+    m, n = query_vectors.shape[0], products.shape[0]
+    top_n = min(top_n, int(valid.sum()))
+
+    best_scores = np.full((m, top_n), -np.inf, dtype=np.float32)
+    best_rows = np.zeros((m, top_n), dtype=np.int64)
+    for start in range(0, n, block_rows):
+        end = min(start + block_rows, n)
+        scores = (1.0 - cf_weight) * (query_vectors @ products[start:end].T)
+        if cf_weight:
+            # Same scale as the dashboard's CF confidence (score * 10 + 50 percent)
+            scores += cf_weight * (user_factors @ item_factors[:, start:end] * 0.1 + 0.5)
+        if user_weights is not None:
+            scores = weighted_scores(user_weights, scores, state["price_score"][start:end],
+                                     state["novelty"][start:end]).astype(np.float32)
+        scores[:, ~valid[start:end]] = -np.inf
+
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        merged_rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, end), (m, end - start))], axis=1)
+        keep = np.argpartition(-merged_scores, top_n - 1, axis=1)[:, :top_n]
+        best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+        best_rows = np.take_along_axis(merged_rows, keep, axis=1)
+
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+    best_rows = np.take_along_axis(best_rows, order, axis=1)
+
+    # Component scores for the winners only
+    content = np.einsum("md,mkd->mk", query_vectors, products[best_rows])
+    if cf_weight:
+        cf = np.einsum("mf,fmk->mk", user_factors, item_factors[:, best_rows]) * 10 + 50
+    else:
+        cf = np.full(best_rows.shape, np.nan, dtype=np.float32)
+    return best_rows, best_scores, content, cf
+
+
+def run_chunk(task):
+    """Scores one chunk of users and writes its part file. Returns (chunk, users, rows written)."""
+    chunk, user_ids, query_vectors, user_factors, user_weights, out_path, top_n, block_rows, fmt = task
+    state = _worker
+    rows, scores, content, cf = score_chunk(query_vectors, user_factors, user_weights, state, top_n, block_rows)
+
+    import pandas as pd
+    n_users, k = rows.shape
+    flat = rows.ravel()
+    df = pd.DataFrame({
+        "user_id": np.repeat(user_ids, k),
+        "rank": np.tile(np.arange(1, k + 1), n_users),
+        "product_id": state["ids"][flat],
+        "title": state["titles"][flat],
+        "price": state["prices"][flat],
+        "score": np.round(scores.ravel() * 100, 2),
+        "content_score": np.round(content.ravel() * 100, 2),
+        "cf_score": np.round(cf.ravel(), 2),
+    })
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    if fmt == "parquet":
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, out_path)  # a part file exists only once it is complete
+    return chunk, n_users, len(df)
+
+
+# --- Driver ---
+def load_shared_state(app, catalog, args):
+    """Product embeddings, the CF model mapped onto catalog rows, and output columns."""
+    from embedding_store import EmbeddingStore, combined_text, from_storage
+    from encoders import create_encoder
+    from vector_index import normalize
+    from interaction_store import load_cf_arrays
+    from cf_model import CollaborativeModel
+
+    encoder = create_encoder(args.backend, args.model)
+    store = EmbeddingStore(args.store_dir, encoder.cache_name, args.dtype)
+    products = normalize(from_storage(store.sync([combined_text(p) for p in catalog.records()], encoder.encode)))
+
+    valid = np.zeros(len(catalog), dtype=bool)
+    valid[list(catalog.id_index.values())] = True
+
+    item_factors, cf = None, None
+    if args.cf_weight > 0:
+        with app.app_context():
+            cf = CollaborativeModel(n_components=args.cf_components).train_from(
+                lambda: load_cf_arrays(app.config['USE_INTERACTION_AGGREGATES']))
+        if cf is None:
+            print("Not enough interactions for CF; scoring by content only.")
+        else:
+            # CF columns are product id strings; align them with catalog rows
+            item_factors = np.zeros((cf.item_factors.shape[0], len(catalog)), dtype=np.float32)
+            for col, pid in enumerate(cf.product_ids):
+                row = catalog.row_of(pid)
+                if row is not None:
+                    item_factors[:, row] = cf.item_factors[:, col]
+
+    price_score = novelty = None
+    if args.rl_weights:
+        # Cheaper scores higher (relative to the catalog's top price); less globally popular
+        # (CF trend, the mean user's factors) scores higher, 0.5 everywhere without CF
+        top_price = catalog.prices.max() if len(catalog) else 0.0
+        price_score = 1.0 - catalog.prices / top_price if top_price > 0 else np.zeros(len(catalog))
+        novelty = np.full(len(catalog), 0.5)
+        if item_factors is not None:
+            popularity = cf.user_factors.mean(axis=0) @ item_factors
+            if np.ptp(popularity) > 0:
+                novelty = 1.0 - (popularity - popularity.min()) / np.ptp(popularity)
+
+    state = {
+        "products": products,
+        "price_score": price_score,
+        "novelty": novelty,
+        "item_factors": item_factors,
+        "valid": valid,
+        "cf_weight": args.cf_weight,
+        "ids": catalog.ids,
+        "titles": catalog.titles,
+        "prices": catalog.prices,
+    }
+    return state, encoder, cf
+
+
+def user_factor_rows(cf, user_ids):
+    """Each user's CF factors; users CF has not seen get the mean (i.e. the global trend)."""
+    if cf is None:
+        return None
+    mean = cf.user_factors.mean(axis=0)
+    rows = [cf.user_index.get(uid) for uid in user_ids.tolist()]
+    return np.stack([cf.user_factors[r] if r is not None else mean for r in rows]).astype(np.float32)
+
+
+def rl_weight_rows(stored_weights):
+    """users x 3 RL weights (rl_weights.WEIGHT_NAMES order); unreadable values get the defaults."""
+    rows = []
+    for stored in stored_weights:
+        try:
+            rows.append(weight_vector(stored))
+        except (ValueError, TypeError, AttributeError):
+            rows.append(weight_vector(None))
+    return np.stack(rows)
+
+
+def iter_user_chunks(app, chunk_size):
+    """
+    (chunk number, user ids, preferences, RL weights JSON) by fixed id ranges, so chunk
+    numbers survive restarts.
+    """
+    from sqlalchemy import select, func
+    from models import db, User
+
+    with app.app_context():
+        max_id = db.session.execute(select(func.max(User.id))).scalar() or 0
+    for chunk, low in enumerate(range(1, max_id + 1, chunk_size)):
+        with app.app_context():
+            rows = db.session.execute(
+                select(User.id, User.preferences, User.rl_weights).where(User.id >= low, User.id < low + chunk_size)
+                .order_by(User.id)).all()
+        if rows:
+            yield chunk, np.array([r[0] for r in rows], dtype=np.int64), [r[1] for r in rows], [r[2] for r in rows]
+
+
+def check_run_file(out_dir, params, resume):
+    """Refuses to mix part files from runs with different settings."""
+    path = os.path.join(out_dir, RUN_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            previous = json.load(f)
+        if not resume:
+            raise SystemExit(f"{out_dir} already holds a run; pass --resume or choose another --out")
+        mismatched = [k for k in ("top_n", "chunk_users", "format", "cf_weight", "rl_weights") if previous.get(k) != params[k]]
+        if mismatched:
+            raise SystemExit(f"Cannot resume: {', '.join(mismatched)} differ from the original run")
+        if previous.get("catalog_version") != params["catalog_version"]:
+            print("WARNING: the catalog changed since this run started; new parts use the new catalog.")
+        return
+    os.makedirs(out_dir, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(params, f, indent=2)
+
+
+def main():
+    from embedding_store import DEFAULT_STORE_DIR, DEFAULT_MODEL_NAME, EMBEDDING_DTYPE, STORAGE_DTYPES
+    from encoders import ENCODER_BACKEND
+
+    parser = argparse.ArgumentParser(description="Precompute top-N recommendations for every user.")
+    parser.add_argument("--out", default="batch_recs", help="Output directory (one part file per chunk)")
+    parser.add_argument("--format", default="csv", choices=FORMATS)
+    parser.add_argument("--top-n", type=int, default=20)
+    parser.add_argument("--chunk-users", type=int, default=2000, help="Users per chunk / part file")
+    parser.add_argument("--block-rows", type=int, default=8192, help="Products per matrix-multiply block")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="0 or 1 runs in-process")
+    parser.add_argument("--encode-batch", type=int, default=256)
+    parser.add_argument("--cf-weight", type=float, default=0.3, help="0 disables collaborative filtering")
+    parser.add_argument("--cf-components", type=int, default=10)
+    parser.add_argument("--rl-weights", action="store_true",
+                        help="Re-rank with each user's RL weights (relevance / price / novelty)")
+    parser.add_argument("--resume", action="store_true", help="Skip chunks whose part file already exists")
+    parser.add_argument("--store-dir", default=DEFAULT_STORE_DIR)
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--backend", default=ENCODER_BACKEND)
+    parser.add_argument("--dtype", default=EMBEDDING_DTYPE, choices=STORAGE_DTYPES)
+    args = parser.parse_args()
+
+    if args.format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit("--format parquet needs pyarrow (pip install pyarrow)")
+
+    from app import app, catalogs
+    from vector_index import normalize
+    catalog = catalogs.current
+    if not len(catalog):
+        raise SystemExit("Catalog is empty; nothing to recommend.")
+
+    params = {"top_n": args.top_n, "chunk_users": args.chunk_users, "format": args.format,
+              "cf_weight": args.cf_weight, "rl_weights": args.rl_weights, "catalog_version": catalog.version,
+              "started_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+    check_run_file(args.out, params, args.resume)
+
+    start = time.perf_counter()
+    state, encoder, cf = load_shared_state(app, catalog, args)
+    print(f"Loaded {len(catalog)} products in {time.perf_counter() - start:.1f}s "
+          f"(CF: {'off' if cf is None else f'{len(cf.user_index)} users'}).")
+
+    with app.app_context():
+        from sqlalchemy import select, func
+        from models import db, User
+        total_users = db.session.execute(select(func.count(User.id))).scalar() or 0
+
+    workers = max(1, args.workers)
+    pool = None
+    if workers > 1:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        pool = ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(state,))
+    else:
+        _init_worker(state)
+
+    query_vectors = {}   # distinct query text -> normalized vector (users share a few combinations)
+    pending = set()
+    done_users = skipped_users = written = 0
+    run_start = time.perf_counter()
+
+    def report(result):
+        nonlocal done_users, written
+        chunk, n_users, n_rows = result
+        done_users += n_users
+        written += n_rows
+        elapsed = time.perf_counter() - run_start
+        rate = done_users / elapsed if elapsed else 0.0
+        remaining = total_users - done_users - skipped_users
+        eta = remaining / rate if rate else 0.0
+        print(f"[chunk {chunk:>5}] {done_users + skipped_users:,}/{total_users:,} users, "
+              f"{rate:,.0f} users/s, ETA {eta:,.0f}s")
+
+    try:
+        for chunk, user_ids, preferences, stored_weights in iter_user_chunks(app, args.chunk_users):
+            out_path = os.path.join(args.out, f"part-{chunk:05d}.{args.format}")
+            if args.resume and os.path.exists(out_path):
+                skipped_users += len(user_ids)
+                continue
+
+            queries = [preference_query(p) for p in preferences]
+            new = list(dict.fromkeys(q for q in queries if q not in query_vectors))
+            if new:
+                encoded = normalize(encoder.encode(new, batch_size=args.encode_batch))
+                query_vectors.update(zip(new, encoded))
+            task = (chunk, user_ids, np.stack([query_vectors[q] for q in queries]),
+                    user_factor_rows(cf, user_ids), rl_weight_rows(stored_weights) if args.rl_weights else None,
+                    out_path, args.top_n, args.block_rows, args.format)
+
+            if pool is None:
+                report(run_chunk(task))
+                continue
+            pending.add(pool.submit(run_chunk, task))
+            # Bounded memory: at most two chunks per worker in flight
+            if len(pending) >= workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    report(future.result())
+        for future in pending:
+            report(future.result())
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - run_start
+    print(f"Done: {done_users:,} users scored ({skipped_users:,} resumed), {written:,} rows, "
+          f"{len(query_vectors):,} distinct queries encoded, {elapsed:.1f}s. Output in {args.out}/")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
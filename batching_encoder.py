@@ -0,0 +1,103 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+import numpy as np
+
+
+class BatchingEncoder:
+    """
+    Micro-batching front for SentenceTransformer.encode.
+    Concurrent requests submit single queries; a worker thread collects them for up to
+    `max_wait_ms` (or until `max_batch_size` is reached), runs one forward pass and hands
+    each row back through its Future.
+    """
+
+    def __init__(self, encode_fn, max_batch_size=32, max_wait_ms=2.0):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+
+        # Metrics
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.batch_size_counts = {}
+
+    # --- Client side ---
+    def submit(self, text):
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, texts, timeout=None):
+        """Drop-in replacement for model.encode(list_of_texts)."""
+        futures = [self.submit(t) for t in texts]
+        return np.vstack([f.result(timeout=timeout) for f in futures])
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so (re)start lazily in whichever process uses us
+        if self._worker is not None and self._worker.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive() or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._worker = threading.Thread(target=self._run, name="batching-encoder", daemon=True)
+                self._worker.start()
+
+    # --- Worker side ---
+    def _run(self):
+        q = self._queue
+        while True:
+            batch = [q.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch):
+        # Identical queries in the same window share one row of the batch
+        unique = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = np.asarray(self.encode_fn(unique))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        rows = {text: i for i, text in enumerate(unique)}
+        for text, future in batch:
+            future.set_result(vectors[rows[text]])
+        self._record(len(batch))
+
+    def _record(self, size):
+        with self._lock:
+            self.batches += 1
+            self.items += size
+            self.max_batch_seen = max(self.max_batch_seen, size)
+            self.batch_size_counts[size] = self.batch_size_counts.get(size, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "max_batch_size": self.max_batch_seen,
+                "batch_size_counts": dict(self.batch_size_counts),
+                "window_ms": self.max_wait * 1000,
+                "batch_limit": self.max_batch_size,
+            }
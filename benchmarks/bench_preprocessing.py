@@ -0,0 +1,70 @@
+"""
+Per-query cost of preprocess_query: the original per-call implementation versus the
+cached preprocessing module (NLTK tokenizer and regex fast path).
+
+    python benchmarks/bench_preprocessing.py --queries 2000
+"""
+import os
+import sys
+import time
+import json
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import preprocessing
+
+WORDS = ["gifts", "books", "for", "my", "mother", "who", "loves", "gardening", "and", "cooking", "birthday",
+         "anniversary", "watches", "brother", "tech", "gadgets", "the", "best", "handmade", "candles", "friends"]
+
+
+def legacy_preprocess_query(text):
+    """The pre-module implementation: rebuilds stopwords and the lemmatizer on every call."""
+    from nltk.corpus import stopwords
+    from nltk.tokenize import word_tokenize
+    from nltk.stem import WordNetLemmatizer
+    if not text:
+        return ""
+    tokens = word_tokenize(text.lower())
+    stop_words = set(stopwords.words('english'))
+    filtered_tokens = [w for w in tokens if w.isalpha() and w not in stop_words]
+    lemmatizer = WordNetLemmatizer()
+    return " ".join(lemmatizer.lemmatize(w) for w in filtered_tokens)
+
+
+def per_query_us(fn, queries):
+    try:
+        fn(queries[0])  # warm-up (loads corpora)
+    except LookupError:
+        return None  # NLTK data not installed (python bootstrap.py nltk)
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return round((time.perf_counter() - start) / len(queries) * 1e6, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    queries = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 10))) for _ in range(args.queries)]
+
+    report = {
+        "queries": args.queries,
+        "legacy_us_per_query": per_query_us(legacy_preprocess_query, queries),
+        "cached_nltk_us_per_query": per_query_us(lambda q: preprocessing.preprocess_query(q, fast=False), queries),
+        "cached_regex_us_per_query": per_query_us(lambda q: preprocessing.preprocess_query(q, fast=True), queries),
+    }
+    start = time.perf_counter()
+    preprocessing.preprocess_many(queries, fast=True)
+    report["batch_regex_us_per_query"] = round((time.perf_counter() - start) / len(queries) * 1e6, 1)
+    report["lemma_cache"] = preprocessing.cache_info()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
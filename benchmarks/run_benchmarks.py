@@ -0,0 +1,214 @@
+"""
+Benchmark suite for GiftRecommender and the Flask routes.
+
+    python benchmarks/synthetic_data.py --products 10000 --interactions 100000 --out bench_data
+    python benchmarks/run_benchmarks.py --data bench_data --requests 200
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/a.json benchmarks/results/b.json
+
+Reports p50/p95/p99 latency, throughput and peak RSS, and saves everything as JSON
+under benchmarks/results/ (named by timestamp and git commit) for comparison.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+QUERIES = ["birthday gift for mom", "tech gadgets for brother", "anniversary jewellery", "kitchen chef set",
+           "travel accessories", "personalized photo frame", "fitness lover", "book lover friend"]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def summarize(latencies, wall_time):
+    ms = np.array(latencies) * 1000
+    return {
+        "n": len(ms),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "throughput_rps": round(len(ms) / wall_time, 2) if wall_time else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def timed(fn, n, warmup=3):
+    for _ in range(warmup):
+        fn(0)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(n):
+        t0 = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+# --- Microbenchmarks ---
+def bench_recommender(engine, n, user_ids):
+    results = {}
+    results["get_content_based"] = timed(lambda i: engine.get_content_based(QUERIES[i % len(QUERIES)], top_k=10), n)
+    # Unique queries so the query-embedding cache cannot hide the encode cost
+    results["get_content_based_uncached"] = timed(
+        lambda i: engine.get_content_based(f"{QUERIES[i % len(QUERIES)]} {i}", top_k=10), n)
+    results["get_hybrid_based"] = timed(
+        lambda i: engine.get_hybrid_based(QUERIES[i % len(QUERIES)], occasion="birthday", relationship="mom", top_k=10), n)
+    # Same, plus reading every item as the template loop does (results are resolved lazily)
+    results["get_hybrid_based_rendered"] = timed(
+        lambda i: list(engine.get_hybrid_based(QUERIES[i % len(QUERIES)], occasion="birthday", relationship="mom", top_k=10)), n)
+    results["get_collaborative_based"] = timed(
+        lambda i: engine.get_collaborative_based(top_k=10, user_id=user_ids[i % len(user_ids)]), n)
+    results["get_random_recommendations"] = timed(lambda i: engine.get_random_recommendations(10, "Random"), n)
+    return results
+
+
+# --- End-to-end Flask test-client load runs ---
+def bench_routes(app_module, n):
+    app = app_module.app
+    app.config["TESTING"] = True
+    catalog = app_module.CATALOG
+    product_ids = catalog.ids.tolist()
+    rng = random.Random(42)
+
+    client = app.test_client()
+    with app.app_context():
+        user = app_module.User.query.first()
+        phone = user.phone
+    resp = client.post("/login", data={"phone": phone, "password": "jegan"})
+    if resp.status_code not in (200, 302):
+        raise SystemExit(f"Login failed for benchmark user {phone}: {resp.status_code}")
+
+    def dashboard_get(i):
+        assert client.get("/dashboard").status_code == 200
+
+    def dashboard_post(i):
+        assert client.post("/dashboard", data={
+            "search_mode": "advanced", "occasion": "birthday", "relationship": "mom",
+            "likes": QUERIES[i % len(QUERIES)], "comments": ""}).status_code == 200
+
+    def feedback(i):
+        client.post("/feedback", json={"product_id": str(rng.choice(product_ids)),
+                                       "action": rng.choice(["like", "dislike", "purchase"])})
+
+    def add_to_cart(i):
+        client.post("/add_to_cart", json={"product_id": rng.choice(product_ids)})
+
+    def checkout(i):
+        client.post("/add_to_cart", json={"product_id": rng.choice(product_ids)})
+        client.post("/checkout")
+
+    return {
+        "GET /dashboard": timed(dashboard_get, n),
+        "POST /dashboard": timed(dashboard_post, n),
+        "POST /feedback": timed(feedback, n),
+        "POST /add_to_cart": timed(add_to_cart, n),
+        "POST /checkout": timed(checkout, max(1, n // 4)),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args):
+    if args.data:
+        data_dir = os.path.abspath(args.data)
+        os.environ["OPTGIFT_CATALOG_CSV"] = os.path.join(data_dir, "catalog.csv")
+        os.environ["OPTGIFT_DATABASE_URI"] = f"sqlite:///{os.path.join(data_dir, 'bench.db')}"
+        os.environ.setdefault("OPTGIFT_EMBEDDING_STORE", os.path.join(data_dir, "embedding_store"))
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "data": args.data,
+    }
+
+    t0 = time.perf_counter()
+    import app as app_module
+    from models import Interaction
+    report["startup_s"] = round(time.perf_counter() - t0, 2)
+    report["catalog_size"] = len(app_module.CATALOG)
+
+    engine = app_module.engine
+    with app_module.app.app_context():
+        report["users"] = app_module.User.query.count()
+        report["interactions"] = Interaction.query.count()
+        # Train CF synchronously so the benchmark does not race the background trainer
+        engine.cf_model.train_from(app_module.load_interactions_for_cf)
+        user_ids = [u.id for u in app_module.User.query.with_entities(app_module.User.id).limit(1000)]
+
+    if not args.skip_micro:
+        report["recommender"] = bench_recommender(engine, args.requests, user_ids or [None])
+    if not args.skip_routes:
+        report["routes"] = bench_routes(app_module, args.requests)
+    report["peak_rss_mb"] = peak_rss_mb()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{report['commit']}.json")
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    print(f"Saved benchmark results to {out}")
+
+
+def compare(path_a, path_b):
+    """Prints p50/p95 deltas between two saved runs."""
+    with open(path_a) as f:
+        a = json.load(f)
+    with open(path_b) as f:
+        b = json.load(f)
+    print(f"{'benchmark':40s} {'p50 A':>9s} {'p50 B':>9s} {'p95 A':>9s} {'p95 B':>9s} {'Δp50':>8s}")
+    for section in ("recommender", "routes"):
+        for name, stats_b in b.get(section, {}).items():
+            stats_a = a.get(section, {}).get(name)
+            if not stats_a:
+                continue
+            delta = (stats_b["p50_ms"] - stats_a["p50_ms"]) / stats_a["p50_ms"] * 100 if stats_a["p50_ms"] else 0.0
+            print(f"{name:40s} {stats_a['p50_ms']:9.2f} {stats_b['p50_ms']:9.2f} "
+                  f"{stats_a['p95_ms']:9.2f} {stats_b['p95_ms']:9.2f} {delta:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark GiftRecommender and the Flask routes.")
+    parser.add_argument("--data", help="Directory from synthetic_data.py (default: the real catalog/DB)")
+    parser.add_argument("--requests", type=int, default=100, help="Iterations per benchmark")
+    parser.add_argument("--output", help="Where to write the JSON report")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-routes", action="store_true")
+    parser.add_argument("--compare", nargs=2, metavar=("A", "B"), help="Compare two saved JSON reports")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Synthetic data generator for benchmarks.
+
+Scales optgiftai_database.csv to N products and fills a database with U users and
+I interactions, deterministically (fixed seed) so runs are comparable between commits.
+
+    python benchmarks/synthetic_data.py --products 100000 --users 10000 --interactions 1000000 --out bench_data
+"""
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ACTIONS = np.array(['like', 'dislike', 'purchase'])
+ADJECTIVES = ["Premium", "Classic", "Deluxe", "Handmade", "Personalized", "Mini", "Vintage", "Eco", "Luxury", "Smart"]
+
+
+def generate_catalog(n_products, seed=42, source=os.path.join(ROOT, 'optgiftai_database.csv')):
+    """Resamples the real catalog with varied titles, prices and unique ids."""
+    rng = np.random.default_rng(seed)
+    base = pd.read_csv(source)
+    df = base.iloc[rng.integers(0, len(base), n_products)].reset_index(drop=True)
+    df['id'] = 10_000_000_000_000 + np.arange(n_products)
+    df['title'] = np.array(ADJECTIVES)[rng.integers(0, len(ADJECTIVES), n_products)] + " " + df['title'].str.strip()
+    df['price'] = np.maximum(99, (df['price'] * rng.uniform(0.6, 1.6, n_products)).round()).astype(int)
+    df['rating'] = np.clip(df['rating'] + rng.normal(0, 0.2, n_products), 1, 5).round(1)
+    return df
+
+
+def generate_interactions(n_interactions, user_ids, product_ids, seed=42):
+    """Zipf-ish popularity so a few products get most of the traffic, like real feedback."""
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, len(product_ids) + 1) ** 0.8
+    weights /= weights.sum()
+    return pd.DataFrame({
+        'user_id': rng.choice(user_ids, n_interactions),
+        'product_id': rng.choice(product_ids, n_interactions, p=weights).astype(str),
+        'action_type': ACTIONS[rng.choice(3, n_interactions, p=[0.6, 0.3, 0.1])],
+    })
+
+
+def populate_database(database_uri, n_users, n_interactions, product_ids, seed=42):
+    """Creates users and interactions with bulk inserts (bypassing the ORM per-row path)."""
+    from flask import Flask
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from models import db, User, Interaction
+    from interaction_store import rebuild_aggregates
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    db.init_app(app)
+    rng = np.random.default_rng(seed)
+
+    with app.app_context():
+        db.create_all()
+        password_hash = generate_password_hash("jegan")
+        prefs = [json.dumps({"interests": ["tech", "home"], "priority": "price", "occasion": "birthday"}),
+                 json.dumps({"interests": ["fashion"], "priority": "quality", "occasion": "anniversary"})]
+        users = [
+            {"name": f"Bench User {i}", "phone": f"8{i:09d}", "password_hash": password_hash,
+             "age": int(15 + i % 36), "preferences": prefs[i % 2]}
+            for i in range(n_users)
+        ]
+        db.session.execute(insert(User), users)
+        db.session.commit()
+        user_ids = [u.id for u in User.query.with_entities(User.id)]
+
+        chunk = 100_000
+        for start in range(0, n_interactions, chunk):
+            size = min(chunk, n_interactions - start)
+            frame = generate_interactions(size, user_ids, product_ids, seed=int(rng.integers(1 << 31)))
+            db.session.execute(insert(Interaction), frame.to_dict('records'))
+            db.session.commit()
+            print(f"  interactions: {start + size}/{n_interactions}")
+        rebuild_aggregates()
+    return user_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a scaled catalog and interaction history.")
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--interactions", type=int, default=100000)
+    parser.add_argument("--out", default="bench_data", help="Output directory")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    csv_path = os.path.join(args.out, "catalog.csv")
+    catalog = generate_catalog(args.products, args.seed)
+    catalog.to_csv(csv_path, index=False)
+    print(f"Wrote {len(catalog)} products to {csv_path}")
+
+    db_path = os.path.abspath(os.path.join(args.out, "bench.db"))
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    populate_database(f"sqlite:///{db_path}", args.users, args.interactions, catalog['id'].to_numpy(), args.seed)
+    print(f"Wrote {args.users} users / {args.interactions} interactions to {db_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Offline bootstrap: everything that used to run at app import time.
+
+    python bootstrap.py nltk        # download NLTK corpora
+    python bootstrap.py seed        # seed 1,000 test users into an empty database
+    python bootstrap.py embeddings  # prebuild the embedding store + vector index
+    python bootstrap.py all
+"""
+import os
+import json
+import random
+import argparse
+
+NLTK_PACKAGES = ['punkt', 'punkt_tab', 'stopwords', 'wordnet']
+
+
+def download_nltk_data():
+    import nltk
+    for package in NLTK_PACKAGES:
+        nltk.download(package)
+
+
+def seed_users(app, count=1000):
+    from werkzeug.security import generate_password_hash
+    from models import db, User
+
+    with app.app_context():
+        db.create_all()
+        if User.query.first():
+            print("Database already has users; skipping seeding.")
+            return
+
+        print(f"Empty database detected. Seeding {count:,} test users...")
+
+        # Shared password for all test accounts
+        password_hash = generate_password_hash("jegan")
+
+        # Data pools for randomization
+        first_names = ["Amit", "Priya", "Rahul", "Anjali", "Vikram", "Neha", "Sanjay", "Deepa", "Arjun", "Kavita"]
+        last_names = ["Sharma", "Verma", "Gupta", "Malhotra", "Joshi", "Patel", "Reddy", "Nair"]
+        interest_options = ["tech", "fashion", "home", "food", "travel"]
+        occasions = ["general", "birthday", "anniversary", "festival"]
+
+        # age_range setup (15 to 50 inclusive = 36 possible ages)
+        min_age = 15
+        max_age = 50
+        age_count = max_age - min_age + 1
+
+        for i in range(count):
+            # 1. Generate Phone Number: 9999999000 to 9999999999
+            phone = f"9999999{str(i).zfill(3)}"
+
+            # 2. Distribute Ages Equally: Cycles through 15-50 repeatedly
+            current_age = min_age + (i % age_count)
+
+            # 3. Randomize Profile Data
+            name = f"{random.choice(first_names)} {random.choice(last_names)}"
+            prefs = {
+                "interests": random.sample(interest_options, random.randint(1, 3)),
+                "priority": random.choice(["price", "quality"]),
+                "occasion": random.choice(occasions)
+            }
+
+            # 4. Create and stage user
+            db.session.add(User(
+                name=name,
+                phone=phone,
+                password_hash=password_hash,
+                age=current_age,
+                preferences=json.dumps(prefs)
+            ))
+
+            # Commit in batches of 100
+            if i % 100 == 0:
+                db.session.commit()
+
+        db.session.commit()
+        print(f"Successfully seeded {count:,} users (Ages 15-50).")
+
+
+def build_embeddings():
+    from models import CATALOG
+    from recommender import GiftRecommender
+    GiftRecommender(CATALOG)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="One-off setup tasks for OptGiftAI.")
+    parser.add_argument("command", choices=["nltk", "seed", "embeddings", "all"])
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.command in ("nltk", "all"):
+        download_nltk_data()
+    if args.command in ("seed", "all"):
+        # Importing app is cheap: the recommender is not built until first use
+        os.environ.setdefault("OPTGIFT_STARTUP_MODE", "lazy")
+        from app import app
+        seed_users(app, args.users)
+    if args.command in ("embeddings", "all"):
+        build_embeddings()
+
+
+if __name__ == "__main__":
+    main()
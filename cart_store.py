@@ -0,0 +1,199 @@
+import json
+import time
+from datetime import datetime
+from sqlalchemy import select, update, delete, insert, inspect, text
+from sqlalchemy.exc import IntegrityError
+from models import db, User, CartItem, Order, OrderLine
+from catalog import coerce_id
+
+ORDER_DATE_FORMAT = "%d %b %Y, %I:%M %p"
+
+
+class InvalidProduct(ValueError):
+    """The product id is missing, malformed or not in the catalog."""
+    pass
+
+
+# --- Cart ---
+def cart_product_ids(user_id):
+    """Product ids in the user's cart, oldest first (one indexed query)."""
+    return db.session.execute(
+        select(CartItem.product_id).where(CartItem.user_id == user_id).order_by(CartItem.id)
+    ).scalars().all()
+
+
+def add_to_cart(user, product_id, catalog):
+    """
+    Returns True if the product was added, False if it was already in the cart. Commits.
+    Raises InvalidProduct for ids the catalog does not have (cart_count must match /cart).
+    """
+    raw_id, product_id = product_id, coerce_id(product_id)
+    if product_id is None or catalog.row_of(product_id) is None:
+        raise InvalidProduct(f"Unknown product: {raw_id!r}")
+    exists = db.session.execute(
+        select(CartItem.id).where(CartItem.user_id == user.id, CartItem.product_id == product_id)
+    ).first()
+    if exists:
+        return False
+    try:
+        db.session.add(CartItem(user_id=user.id, product_id=product_id))
+        db.session.execute(update(User).where(User.id == user.id).values(cart_count=User.cart_count + 1))
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request added it first
+        db.session.rollback()
+        return False
+    db.session.refresh(user, ['cart_count'])
+    return True
+
+
+def remove_from_cart(user, product_id):
+    """Returns True if the product was in the cart. Commits."""
+    result = db.session.execute(
+        delete(CartItem).where(CartItem.user_id == user.id, CartItem.product_id == coerce_id(product_id)))
+    if not result.rowcount:
+        db.session.rollback()
+        return False
+    db.session.execute(update(User).where(User.id == user.id).values(cart_count=User.cart_count - result.rowcount))
+    db.session.commit()
+    db.session.refresh(user, ['cart_count'])
+    return True
+
+
+# --- Orders ---
+def place_order(user, catalog):
+    """
+    Turns the cart into an Order with one OrderLine per product and empties it. Commits.
+    Returns (order, unavailable): cart products the catalog no longer has (removed by a
+    reload) are left out of the order, dropped from the cart and listed in `unavailable`.
+    order is None when nothing in the cart can be ordered.
+    """
+    product_ids = cart_product_ids(user.id)
+    unavailable = [pid for pid in product_ids if catalog.row_of(pid) is None]
+    items = catalog.get_many(product_ids)
+    if not items:
+        if unavailable:
+            _clear_cart(user)
+        return None, unavailable
+    order = Order(user_id=user.id, order_code=f"ORD-{int(time.time())}",
+                  total=sum(item['price'] for item in items))
+    db.session.add(order)
+    db.session.flush()
+    db.session.execute(insert(OrderLine), [_order_line(order.id, item) for item in items])
+    _clear_cart(user)
+    return order, unavailable
+
+
+def _clear_cart(user):
+    db.session.execute(delete(CartItem).where(CartItem.user_id == user.id))
+    db.session.execute(update(User).where(User.id == user.id).values(cart_count=0))
+    db.session.commit()
+    db.session.refresh(user, ['cart_count'])
+
+
+def _order_line(order_id, item):
+    return {"order_id": order_id, "product_id": coerce_id(item.get("id")) or 0, "title": item.get('title'),
+            "vendor": item.get('vendor'), "image_url": item.get('image_url'), "price": item.get('price') or 0.0}
+
+
+def order_history(user_id, page=1, per_page=10):
+    """
+    One page of orders, newest first, as (orders, has_next). Two queries: the page of
+    orders, then all of their lines. Each order is a dict shaped like the old JSON entries.
+    """
+    page = max(1, page)
+    orders = db.session.execute(
+        select(Order).where(Order.user_id == user_id)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .offset((page - 1) * per_page).limit(per_page + 1)
+    ).scalars().all()
+    has_next = len(orders) > per_page
+    orders = orders[:per_page]
+
+    lines = {}
+    if orders:
+        rows = db.session.execute(
+            select(OrderLine).where(OrderLine.order_id.in_([o.id for o in orders])).order_by(OrderLine.id)
+        ).scalars()
+        for line in rows:
+            lines.setdefault(line.order_id, []).append({
+                "id": line.product_id, "title": line.title, "vendor": line.vendor,
+                "image_url": line.image_url, "price": line.price,
+            })
+    return [{
+        "order_id": o.order_code,
+        "date": o.created_at.strftime(ORDER_DATE_FORMAT),
+        "total": o.total,
+        "ordered_products": lines.get(o.id, []),
+    } for o in orders], has_next
+
+
+# --- Migration from the JSON columns on User ---
+def ensure_cart_schema():
+    """Adds user.cart_count to databases created before it existed (create_all never alters)."""
+    columns = {c['name'] for c in inspect(db.engine).get_columns('user')}
+    if 'cart_count' not in columns:
+        print("Adding user.cart_count column...")
+        with db.engine.begin() as conn:
+            conn.execute(text('ALTER TABLE "user" ADD COLUMN cart_count INTEGER NOT NULL DEFAULT 0'))
+
+
+def migrate_json_carts(batch_size=500):
+    """
+    Moves User.cart / User.orders JSON into CartItem, Order and OrderLine rows, then
+    resets the JSON to '[]' so the migration is idempotent. Returns the users migrated.
+    """
+    legacy = (User.cart.notin_(['[]', '']) & User.cart.isnot(None)) | \
+             (User.orders.notin_(['[]', '']) & User.orders.isnot(None))
+    migrated = 0
+    while True:
+        users = db.session.execute(
+            select(User.id, User.cart, User.orders).where(legacy).limit(batch_size)).all()
+        if not users:
+            break
+        for user_id, cart_json, orders_json in users:
+            _migrate_user(user_id, _loads(cart_json), _loads(orders_json))
+        db.session.commit()
+        migrated += len(users)
+    if migrated:
+        print(f"Migrated carts and orders of {migrated} users to normalized tables.")
+    return migrated
+
+
+def _loads(value):
+    try:
+        data = json.loads(value) if value else []
+        return data if isinstance(data, list) else []
+    except ValueError:
+        return []
+
+
+def _migrate_user(user_id, cart_ids, orders):
+    product_ids = []
+    for pid in map(coerce_id, cart_ids):
+        if pid is not None and pid not in product_ids:
+            product_ids.append(pid)
+    existing = set(db.session.execute(
+        select(CartItem.product_id).where(CartItem.user_id == user_id)).scalars())
+    new_items = [{"user_id": user_id, "product_id": pid} for pid in product_ids if pid not in existing]
+    if new_items:
+        db.session.execute(insert(CartItem), new_items)
+
+    # The JSON list is newest first; insert oldest first so ids follow time
+    for entry in reversed(orders):
+        if not isinstance(entry, dict):
+            continue
+        try:
+            created = datetime.strptime(entry.get("date", ""), ORDER_DATE_FORMAT)
+        except (TypeError, ValueError):
+            created = datetime.now()
+        order = Order(user_id=user_id, order_code=str(entry.get("order_id") or f"ORD-{int(time.time())}"),
+                      created_at=created, total=float(entry.get("total") or 0.0))
+        db.session.add(order)
+        db.session.flush()
+        products = [p for p in entry.get("ordered_products", []) if isinstance(p, dict)]
+        if products:
+            db.session.execute(insert(OrderLine), [_order_line(order.id, p) for p in products])
+
+    db.session.execute(update(User).where(User.id == user_id).values(
+        cart='[]', orders='[]', cart_count=len(existing) + len(new_items)))
@@ -0,0 +1,294 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["id", "title", "rating", "tags", "price", "description", "image_url", "vendor", "link"]
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def coerce_id(product_id):
+    """Product ids arrive as ints, numeric strings ('7940000000000') or CSV floats ('7.94E+12')."""
+    try:
+        return int(product_id)
+    except (TypeError, ValueError):
+        try:
+            return int(float(product_id))
+        except (TypeError, ValueError):
+            return None
+
+
+class Catalog:
+    """
+    Columnar product catalog: one NumPy array per field, plus an id -> row hash index.
+    Row dicts (the shape templates and the recommender expect) are materialized once and
+    shared, so treat them as read-only and .copy() before adding per-request fields.
+    """
+
+    def __init__(self, columns):
+        self.ids = np.asarray(columns["id"], dtype=np.int64)
+        self.titles = np.asarray(columns["title"], dtype=object)
+        self.ratings = np.asarray(columns["rating"], dtype=np.float64)
+        self.tags = np.empty(len(self.ids), dtype=object)
+        self.tags[:] = [t if isinstance(t, list) else [] for t in columns["tags"]]
+        self.prices = np.asarray(columns["price"], dtype=np.float64)
+        self.descriptions = np.asarray(columns["description"], dtype=object)
+        self.image_urls = np.asarray(columns["image_url"], dtype=object)
+        self.vendors = np.asarray(columns["vendor"], dtype=object)
+        self.links = np.asarray(columns["link"], dtype=object)
+
+        # id -> row; the CSV has repeated ids, and the first row wins (as the old linear scans did)
+        self.id_index = {}
+        for row, pid in enumerate(self.ids.tolist()):
+            self.id_index.setdefault(pid, row)
+        self._records = None
+
+        # Inverted index over lowercased title + tags (the text hybrid scoring matches against)
+        self.match_texts = np.array(
+            [(f"{title} " + " ".join(tags)).lower() for title, tags in zip(self.titles, self.tags)], dtype=object)
+        postings = {}
+        for row, text in enumerate(self.match_texts):
+            for token in set(TOKEN_RE.findall(text)):
+                postings.setdefault(token, []).append(row)
+        self.term_index = {token: np.array(rows, dtype=np.int64) for token, rows in postings.items()}
+        self._mask_cache = {}
+        self._version = None
+
+    @property
+    def version(self):
+        """Content hash of every row; changes whenever any product field does."""
+        if self._version is None:
+            digest = hashlib.sha1()
+            for record in self.records():
+                digest.update(json.dumps(record, sort_keys=True, default=str).encode("utf-8"))
+            self._version = digest.hexdigest()[:12]
+        return self._version
+
+    # --- Loading ---
+    @classmethod
+    def from_dataframe(cls, df):
+        df = df.reindex(columns=COLUMNS)
+        tags = df["tags"].fillna("").astype(str)
+        return cls({
+            "id": df["id"].fillna(0).astype("int64").to_numpy(),
+            "title": df["title"].fillna("Unknown Product").to_numpy(dtype=object),
+            "rating": df["rating"].fillna(0.0).astype(float).to_numpy(),
+            "tags": [t.split(', ') if t else [] for t in tags.tolist()],
+            "price": df["price"].fillna(0.0).astype(float).to_numpy(),
+            "description": df["description"].fillna("").to_numpy(dtype=object),
+            "image_url": df["image_url"].fillna("").to_numpy(dtype=object),
+            "vendor": df["vendor"].fillna("Unknown").to_numpy(dtype=object),
+            "link": df["link"].fillna("#").to_numpy(dtype=object),
+        })
+
+    @classmethod
+    def from_csv(cls, csv_file):
+        return cls.from_dataframe(pd.read_csv(csv_file))
+
+    @classmethod
+    def from_records(cls, products):
+        return cls({col: [p.get(col) for p in products] for col in COLUMNS})
+
+    @classmethod
+    def empty(cls):
+        return cls({col: [] for col in COLUMNS})
+
+    def __len__(self):
+        return self.ids.shape[0]
+
+    # --- Row access ---
+    def records(self):
+        """All rows as dicts (built once, then cached)."""
+        if self._records is None:
+            self._records = [
+                {
+                    "id": int(pid), "title": title, "rating": float(rating), "tags": tags,
+                    "price": float(price), "description": desc, "image_url": img,
+                    "vendor": vendor, "link": link,
+                }
+                for pid, title, rating, tags, price, desc, img, vendor, link in zip(
+                    self.ids.tolist(), self.titles, self.ratings.tolist(), self.tags,
+                    self.prices.tolist(), self.descriptions, self.image_urls, self.vendors, self.links)
+            ]
+        return self._records
+
+    def row(self, i):
+        return self.records()[i]
+
+    def row_of(self, product_id):
+        return self.id_index.get(coerce_id(product_id))
+
+    def rows_of(self, product_ids):
+        """Row numbers for the ids that exist, in the order given."""
+        rows = (self.id_index.get(coerce_id(pid)) for pid in product_ids)
+        return np.fromiter((r for r in rows if r is not None), dtype=np.int64)
+
+    def get(self, product_id):
+        row = self.row_of(product_id)
+        return None if row is None else self.row(row)
+
+    def get_many(self, product_ids):
+        """Batch lookup: O(k) in the number of ids, missing ids are skipped."""
+        records = self.records()
+        return [records[r] for r in self.rows_of(product_ids)]
+
+    def total_price(self, product_ids):
+        return float(self.prices[self.rows_of(product_ids)].sum())
+
+    # --- Metadata matching ---
+    def match_mask(self, term):
+        """
+        Boolean mask over the catalog: rows whose title/tags contain `term` as a substring.
+        Each query token is substring-tested against the index vocabulary (cost grows with
+        the number of distinct tokens), then only the candidate rows it yields get the full
+        substring check rather than every product text. Results are memoized per term.
+        """
+        term = (term or "").lower().strip()
+        if not term:
+            return None
+        cached = self._mask_cache.get(term)
+        if cached is not None:
+            return cached
+
+        rows = None
+        for token in TOKEN_RE.findall(term):
+            hits = [postings for vocab, postings in self.term_index.items() if token in vocab]
+            token_rows = np.unique(np.concatenate(hits)) if hits else np.empty(0, dtype=np.int64)
+            rows = token_rows if rows is None else np.intersect1d(rows, token_rows)
+        if rows is None:
+            rows = np.arange(len(self))
+
+        mask = np.zeros(len(self), dtype=bool)
+        # Multi-word / punctuated terms still need the exact substring check
+        mask[rows] = [term in self.match_texts[r] for r in rows]
+        mask.setflags(write=False)
+        if len(self._mask_cache) < 4096:
+            self._mask_cache[term] = mask
+        return mask
+
+    def first_excluding(self, exclude_ids):
+        """First product (catalog order) whose id is not in exclude_ids."""
+        exclude = np.fromiter((i for i in map(coerce_id, exclude_ids) if i is not None), dtype=np.int64)
+        candidates = np.flatnonzero(~np.isin(self.ids, exclude))
+        return self.row(int(candidates[0])) if candidates.size else None
+
+
+def load_catalog(csv_file='optgiftai_database.csv'):
+    if not os.path.exists(csv_file):
+        print(f"WARNING: {csv_file} not found. Returning empty catalog.")
+        return Catalog.empty()
+    try:
+        return Catalog.from_csv(csv_file)
+    except Exception as e:
+        print(f"Error loading product database: {e}")
+        return Catalog.empty()
+
+
+# --- Versioning / hot reload ---
+def diff_catalogs(old, new):
+    """Compares two catalogs by product id: which rows appeared, vanished or changed."""
+    from embedding_store import combined_text, text_hash
+
+    def by_id(catalog):
+        records = catalog.records()
+        return {pid: records[row] for pid, row in catalog.id_index.items()}
+
+    old_rows, new_rows = by_id(old), by_id(new)
+    text_changed = fields_changed = 0
+    for pid in old_rows.keys() & new_rows.keys():
+        a, b = old_rows[pid], new_rows[pid]
+        if text_hash(combined_text(a)) != text_hash(combined_text(b)):
+            text_changed += 1  # needs a new embedding
+        elif a != b:
+            fields_changed += 1  # price / rating / links only
+    return {
+        "old_version": old.version,
+        "new_version": new.version,
+        "added": len(new_rows.keys() - old_rows.keys()),
+        "removed": len(old_rows.keys() - new_rows.keys()),
+        "text_changed": text_changed,
+        "fields_changed": fields_changed,
+        "rows": len(new),
+    }
+
+
+class CatalogManager:
+    """
+    Holds the live Catalog and swaps in new versions without a restart.
+    reload() parses the CSV, diffs it against the live catalog and, if anything changed,
+    calls each on_reload(catalog, diff) listener to prepare for it off to the side (the
+    recommender re-embeds changed rows and rebuilds its index there). A listener may return
+    a publish callable: once all are prepared, `current` and every publish run back to back,
+    so requests never see the new catalog next to the old index. Requests keep reading the
+    old `current` while the listeners work.
+
+    Each process reloads on its own (one watcher per process), so preforked workers can
+    serve different catalog versions for as long as a reload takes.
+    """
+
+    def __init__(self, catalog, csv_file):
+        self.current = catalog
+        self.csv_file = csv_file
+        self._listeners = []
+        self._reload_lock = threading.Lock()
+        self._mtime = self._csv_mtime()
+        self._watcher = None
+        self._watcher_pid = None
+
+    def on_reload(self, listener):
+        self._listeners.append(listener)
+        return listener
+
+    def _csv_mtime(self):
+        try:
+            return os.stat(self.csv_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self, csv_file=None):
+        """Returns the diff, or None if the file matches the live catalog. Raises on a bad CSV."""
+        with self._reload_lock:
+            self._mtime = self._csv_mtime()
+            new = Catalog.from_csv(csv_file or self.csv_file)
+            if not len(new):
+                raise ValueError("New catalog is empty; keeping the current one")
+            if new.version == self.current.version:
+                return None
+            diff = diff_catalogs(self.current, new)
+            start = time.perf_counter()
+            # Slow part first (re-embed, re-index); a failure here leaves everything as it was
+            publishers = [listener(new, diff) for listener in self._listeners]
+            old, self.current = self.current, new
+            try:
+                for publish in publishers:
+                    if publish is not None:
+                        publish()
+            except Exception:
+                self.current = old
+                raise
+            diff["seconds"] = round(time.perf_counter() - start, 2)
+            print(f"Catalog reloaded: {diff}")
+            return diff
+
+    def watch(self, interval=10.0):
+        """Polls the CSV's mtime in a daemon thread (once per process) and reloads on change."""
+        if self._watcher is not None and self._watcher.is_alive() and self._watcher_pid == os.getpid():
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                mtime = self._csv_mtime()
+                if mtime is not None and mtime != self._mtime:
+                    try:
+                        self.reload()
+                    except Exception as e:
+                        print(f"Catalog reload failed (keeping version {self.current.version}): {e}")
+
+        self._watcher_pid = os.getpid()
+        self._watcher = threading.Thread(target=run, name="catalog-watcher", daemon=True)
+        self._watcher.start()
@@ -0,0 +1,216 @@
+import time
+import threading
+import numpy as np
+from scipy import sparse
+
+# Score: Purchase=5, Like=3, anything else (dislike/view)=1
+ACTION_SCORES = {'purchase': 5, 'like': 3}
+MIN_INTERACTIONS = 5
+
+
+def action_score(action):
+    return ACTION_SCORES.get(action, 1)
+
+
+class CFSnapshot:
+    """Immutable result of one training run. Requests only ever read a snapshot."""
+    __slots__ = ("version", "built_at", "product_ids", "product_index", "user_index",
+                 "user_factors", "item_factors", "ratings", "global_scores", "n_interactions")
+
+    def __init__(self, version, product_ids, user_ids, user_factors, item_factors, ratings, n_interactions):
+        self.version = version
+        self.built_at = time.time()
+        self.product_ids = product_ids
+        self.product_index = {pid: i for i, pid in enumerate(product_ids)}
+        self.user_index = {uid: i for i, uid in enumerate(user_ids)}
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.ratings = ratings  # the CSR user x product matrix it was trained on
+        # Globally trending items: mean reconstructed score over all users
+        self.global_scores = user_factors.mean(axis=0) @ item_factors
+        self.n_interactions = n_interactions
+
+    def scores_for(self, user_id, user_vector=None):
+        """Predicted score per product for one user (falls back to the global trend)."""
+        if user_vector is not None:
+            return user_vector @ self.item_factors
+        row = self.user_index.get(user_id)
+        if row is None:
+            return self.global_scores
+        return self.user_factors[row] @ self.item_factors
+
+
+class CollaborativeModel:
+    """
+    Matrix Factorization (SVD) over a sparse CSR user x product matrix.
+    Training runs off the request path (on a schedule or after N new interactions);
+    new interactions are folded into the user's latent vector immediately.
+    """
+
+    def __init__(self, n_components=10, retrain_every=300, retrain_after=200):
+        self.n_components = n_components
+        self.retrain_every = retrain_every
+        self.retrain_after = retrain_after
+        self.snapshot = None
+        self.pending = 0
+        self._version = 0
+        self._fold_ins = {}   # user_id -> {product_col: score} since the last snapshot
+        self._lock = threading.Lock()
+        self._train_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    @property
+    def version(self):
+        snap = self.snapshot
+        return snap.version if snap is not None else 0
+
+    # --- Training ---
+    def fit(self, interactions):
+        """Trains from Interaction rows (objects with user_id, product_id, action_type)."""
+        user_ids = [i.user_id for i in interactions]
+        product_ids = [str(i.product_id) for i in interactions]
+        scores = [action_score(i.action_type) for i in interactions]
+        return self.fit_arrays(user_ids, product_ids, scores)
+
+    def fit_arrays(self, user_ids, product_ids, scores):
+        """Trains from parallel arrays; duplicate (user, product) pairs keep the highest score."""
+        n = len(scores)
+        if n < MIN_INTERACTIONS:
+            return None
+
+        uniq_users, u_rows = np.unique(np.asarray(user_ids), return_inverse=True)
+        uniq_products, p_cols = np.unique(np.asarray(product_ids).astype(str), return_inverse=True)
+        if len(uniq_products) < 2:
+            return None
+
+        matrix = sparse.coo_matrix(
+            (np.asarray(scores, dtype=np.float32), (u_rows, p_cols)),
+            shape=(len(uniq_users), len(uniq_products)),
+        )
+        # COO -> CSR sums duplicates, so take the max explicitly first
+        matrix = _max_duplicates(matrix).tocsr()
+
+        from sklearn.decomposition import TruncatedSVD  # heavy import, only needed by the trainer
+
+        with self._train_lock:
+            n_components = min(self.n_components, len(uniq_products) - 1)
+            svd = TruncatedSVD(n_components=n_components, random_state=42)
+            user_factors = svd.fit_transform(matrix).astype(np.float32)
+            item_factors = svd.components_.astype(np.float32)
+
+            with self._lock:
+                self._version += 1
+                snap = CFSnapshot(self._version, uniq_products.tolist(), uniq_users.tolist(),
+                                  user_factors, item_factors, matrix, n)
+                self.snapshot = snap
+                self._fold_ins = {}
+                self.pending = 0
+        return snap
+
+    # --- Incremental fold-in ---
+    def record(self, user_id, product_id, action):
+        """Folds one new interaction into the user's latent vector without retraining."""
+        with self._lock:
+            self.pending += 1
+            snap = self.snapshot
+            if snap is not None:
+                col = snap.product_index.get(str(product_id))
+                if col is not None:
+                    ratings = self._fold_ins.setdefault(user_id, {})
+                    ratings[col] = max(ratings.get(col, 0), action_score(action))
+            due = self.pending >= self.retrain_after
+        if due:
+            self._wakeup.set()
+
+    def _folded_vector(self, snap, user_id):
+        ratings = self._fold_ins.get(user_id)
+        if not ratings or snap is not self.snapshot:
+            return None
+        # Project the user's row onto the item factors: u = r . V^T
+        cols = np.fromiter(ratings.keys(), dtype=np.int64)
+        vals = np.fromiter(ratings.values(), dtype=np.float32)
+        row = snap.user_index.get(user_id)
+        if row is None:
+            return vals @ snap.item_factors[:, cols].T
+        # The snapshot's vector already projects the trained row, so add only how far each
+        # fold-in raised its column (pairs are max-scored, as in training), not the whole score
+        known = snap.ratings[row, cols].toarray().ravel()
+        return snap.user_factors[row] + (np.maximum(vals, known) - known) @ snap.item_factors[:, cols].T
+
+    # --- Serving ---
+    def is_personalized(self, user_id):
+        """True if recommend() gives this user their own list rather than the global trend."""
+        snap = self.snapshot
+        if snap is None:
+            return False
+        with self._lock:
+            return user_id in snap.user_index or user_id in self._fold_ins
+
+    def score_products(self, user_id, product_ids):
+        """CF score of each given product for the user (0 for products the model has not seen),
+        or None before the first training run. user_id=None gives the global trend."""
+        snap = self.snapshot
+        if snap is None:
+            return None
+        with self._lock:
+            vector = self._folded_vector(snap, user_id)
+        scores = snap.scores_for(user_id, vector)
+        cols = np.fromiter((snap.product_index.get(str(pid), -1) for pid in product_ids),
+                           dtype=np.int64, count=len(product_ids))
+        return np.where(cols >= 0, scores[cols], 0.0)
+
+    def recommend(self, user_id=None, top_k=8):
+        """Returns (product_ids, scores) best first, or None when no model is trained yet."""
+        snap = self.snapshot
+        if snap is None:
+            return None
+        with self._lock:
+            vector = self._folded_vector(snap, user_id)
+        scores = snap.scores_for(user_id, vector)
+        k = min(top_k, scores.shape[0])
+        if k <= 0:
+            return [], scores[:0]
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [snap.product_ids[i] for i in best], scores[best]
+
+    # --- Background trainer ---
+    def start_background(self, loader):
+        """
+        Retrains in a daemon thread every `retrain_every` seconds, or sooner once
+        `retrain_after` interactions have been recorded. `loader()` returns either a list
+        of Interaction rows or a (user_ids, product_ids, scores) tuple.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def run():
+            while True:
+                self.train_from(loader)
+                self._wakeup.wait(self.retrain_every)
+                self._wakeup.clear()
+
+        self._thread = threading.Thread(target=run, name="cf-trainer", daemon=True)
+        self._thread.start()
+
+    def train_from(self, loader):
+        try:
+            data = loader()
+            if isinstance(data, tuple):
+                return self.fit_arrays(*data)
+            return self.fit(data)
+        except Exception as e:
+            print(f"CF training failed (keeping previous snapshot): {e}")
+            return None
+
+
+def _max_duplicates(coo):
+    """Collapses duplicate (row, col) entries of a COO matrix to their maximum value."""
+    if coo.nnz == 0:
+        return coo
+    order = np.lexsort((-coo.data, coo.col, coo.row))
+    rows, cols, data = coo.row[order], coo.col[order], coo.data[order]
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+    return sparse.coo_matrix((data[first], (rows[first], cols[first])), shape=coo.shape)
@@ -0,0 +1,149 @@
+import time
+import sqlite3
+import threading
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import make_transient_to_detached
+
+# WAL lets /feedback writers commit while dashboard readers keep reading; NORMAL sync is
+# safe under WAL (a crash can lose the last commits, never corrupt the file)
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,        # ms to wait on a locked database instead of failing
+    "cache_size": -20000,        # ~20 MB page cache per connection
+    "temp_store": "MEMORY",
+    "mmap_size": 268435456,
+}
+
+_pragmas_installed = False
+
+
+def normalize_uri(uri):
+    """Accepts the postgres:// scheme some hosts hand out (SQLAlchemy wants postgresql://)."""
+    if uri.startswith("postgres://"):
+        return "postgresql://" + uri[len("postgres://"):]
+    return uri
+
+
+def engine_options(uri, pool_size=10, max_overflow=20, pool_recycle=1800):
+    """SQLALCHEMY_ENGINE_OPTIONS for the given database URI."""
+    if uri.startswith("sqlite"):
+        if ":memory:" in uri or uri.rstrip("/") == "sqlite:":
+            return {}  # in-memory: a single shared connection, pool settings do not apply
+        return {
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "connect_args": {"timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000, "check_same_thread": False},
+        }
+    # Postgres (or any server database): bounded pool, drop dead connections transparently
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_pre_ping": True,
+        "pool_recycle": pool_recycle,
+    }
+
+
+def enable_sqlite_pragmas(pragmas=SQLITE_PRAGMAS):
+    """Runs the pragmas on every new SQLite connection (server databases are left alone)."""
+    global _pragmas_installed
+    if _pragmas_installed:
+        return
+
+    @event.listens_for(Engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    _pragmas_installed = True
+
+
+def ensure_indexes(db):
+    """Creates indexes declared on models that an older database is missing (create_all skips them)."""
+    created = []
+    for table in db.metadata.sorted_tables:
+        existing = {ix["name"] for ix in sa_inspect(db.engine).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=db.engine)
+                created.append(index.name)
+    if created:
+        print(f"Created missing indexes: {', '.join(created)}")
+    return created
+
+
+class UserCache:
+    """
+    Per-process TTL cache of the logged-in user's row for Flask-Login's user_loader.
+    Hits rebuild the User from cached column values and attach it to the request's
+    session without a SELECT, so routes can still modify and commit it.
+    Writers call invalidate(user_id); a generation counter stops a read that raced an
+    invalidation from caching the old row. The TTL bounds staleness across processes.
+
+    Columns in `exclude` are never cached: they load from the DB on first access, for
+    values that are read-modified-written and must not come from another process's past.
+    """
+
+    def __init__(self, model, session, ttl=10.0, maxsize=10000, exclude=()):
+        self.model = model
+        self.session = session
+        self.ttl = ttl
+        self.maxsize = maxsize
+        # Deferred columns (e.g. legacy JSON blobs) stay unloaded, as they would on a normal query
+        self.columns = [attr.key for attr in sa_inspect(model).column_attrs
+                        if not attr.deferred and attr.key not in exclude]
+        self._data = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, user_id):
+        if self.ttl <= 0:
+            return self.session.get(self.model, user_id)
+        with self._lock:
+            entry = self._data.get(user_id)
+            generation = self._generations.get(user_id, 0)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                self.hits += 1
+                values = entry[0]
+            else:
+                self.misses += 1
+                values = None
+        if values is not None:
+            return self._attach(values)
+
+        user = self.session.get(self.model, user_id)
+        if user is not None:
+            values = {key: getattr(user, key) for key in self.columns}
+            with self._lock:
+                if self._generations.get(user_id, 0) == generation:
+                    if len(self._data) >= self.maxsize:
+                        self._data.clear()
+                    self._data[user_id] = (values, time.monotonic())
+        return user
+
+    def _attach(self, values):
+        user = self.model(**values)
+        make_transient_to_detached(user)
+        return self.session.merge(user, load=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._data.pop(user_id, None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def invalidate_many(self, user_ids):
+        for user_id in user_ids:
+            self.invalidate(user_id)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / total, 4) if total else 0.0}
@@ -0,0 +1,254 @@
+import os
+import json
+import hashlib
+import argparse
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to no cross-process locking
+    fcntl = None
+
+DEFAULT_STORE_DIR = os.environ.get("OPTGIFT_EMBEDDING_STORE", "embedding_store")
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+# On-disk precision of the stored vectors: float32, float16 (half the memory) or int8 (a quarter)
+EMBEDDING_DTYPE = os.environ.get("OPTGIFT_EMBEDDING_DTYPE", "float32")
+STORAGE_DTYPES = ("float32", "float16", "int8")
+# int8 rows are unit vectors scaled so every component fits in [-127, 127]
+INT8_SCALE = 127.0
+# Max acceptable |re-encoded - stored| per dtype during validate
+VALIDATE_TOLERANCE = {"float32": 1e-3, "float16": 2e-3, "int8": 1.5 / INT8_SCALE}
+
+
+def combined_text(product):
+    """Text that gets embedded for a product: Title + Description + Tags."""
+    tags = product.get("tags", [])
+    tag_text = " ".join(tags) if isinstance(tags, list) else str(tags)
+    return f"{product.get('title') or ''} {product.get('description') or ''} {tag_text}"
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def to_storage(matrix, dtype):
+    """Converts float32 embeddings to the storage dtype (int8 rows are L2-normalized first)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if dtype == "int8":
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True) if matrix.size else 1.0
+        unit = matrix / np.where(norms == 0, 1.0, norms)
+        return np.clip(np.rint(unit * INT8_SCALE), -INT8_SCALE, INT8_SCALE).astype(np.int8)
+    return matrix.astype(dtype, copy=False)
+
+
+def from_storage(matrix):
+    """Stored rows back to float32; the dtype of the array says how they were stored."""
+    matrix = np.asarray(matrix)
+    if matrix.dtype == np.int8:
+        return matrix.astype(np.float32) / INT8_SCALE
+    return matrix.astype(np.float32, copy=False)
+
+
+class EmbeddingStore:
+    """
+    Content-addressed on-disk cache of product embeddings.
+    Vectors live in a .npy file (memory-mapped on load, so gunicorn workers share the
+    same page cache) and a manifest records the model name plus one text hash per row.
+    Only rows whose text hash is new or changed get re-encoded.
+    Each storage dtype gets its own files, so switching precision never mixes rows.
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR, model_name=DEFAULT_MODEL_NAME, dtype=EMBEDDING_DTYPE):
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Unknown embedding dtype: {dtype}")
+        self.store_dir = store_dir
+        self.model_name = model_name
+        self.dtype = dtype
+        safe_name = model_name.replace("/", "__")
+        if dtype != "float32":
+            safe_name += f".{dtype}"
+        self.vectors_path = os.path.join(store_dir, f"{safe_name}.npy")
+        self.manifest_path = os.path.join(store_dir, f"{safe_name}.manifest.json")
+        self.lock_path = os.path.join(store_dir, f"{safe_name}.lock")
+        self.index_path = os.path.join(store_dir, f"{safe_name}.index.npz")
+        self.last_encoded = 0
+
+    # --- Loading ---
+    def load(self):
+        """Returns (manifest, mmap vectors) or (None, None) if the store is missing/stale."""
+        if not (os.path.exists(self.manifest_path) and os.path.exists(self.vectors_path)):
+            return None, None
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get("model_name") != self.model_name:
+                return None, None
+            vectors = np.load(self.vectors_path, mmap_mode="r")
+            if vectors.dtype != np.dtype(self.dtype) or vectors.shape[0] != len(manifest.get("hashes", [])):
+                return None, None
+            return manifest, vectors
+        except (OSError, ValueError) as e:
+            print(f"Embedding store unreadable ({e}); rebuilding.")
+            return None, None
+
+    def load_current(self, texts, hashes=None):
+        """The stored matrix if it matches `texts` row for row, else None. Never encodes."""
+        manifest, vectors = self.load()
+        if manifest is None:
+            return None
+        if hashes is None:
+            hashes = [text_hash(t) for t in texts]
+        return vectors if manifest["hashes"] == hashes else None
+
+    # --- Sync with the current catalog ---
+    def sync(self, texts, encode_fn):
+        """
+        Returns an embedding matrix aligned with `texts`.
+        Reuses cached rows by text hash and calls `encode_fn` only for new/changed texts.
+        """
+        hashes = [text_hash(t) for t in texts]
+
+        vectors = self.load_current(texts, hashes)
+        if vectors is not None:
+            self.last_encoded = 0
+            return vectors
+
+        with self._lock():
+            # Another worker may have rebuilt the store while we waited for the lock
+            manifest, vectors = self.load()
+            if manifest is not None and manifest["hashes"] == hashes:
+                self.last_encoded = 0
+                return vectors
+
+            cached = {}
+            if manifest is not None:
+                for row, h in enumerate(manifest["hashes"]):
+                    cached.setdefault(h, row)
+
+            # Encode each missing text once, even if it appears on several rows
+            missing = {}
+            for t, h in zip(texts, hashes):
+                if h not in cached and h not in missing:
+                    missing[h] = t
+
+            fresh = {}
+            if missing:
+                encoded = to_storage(encode_fn(list(missing.values())), self.dtype)
+                fresh = {h: encoded[i] for i, h in enumerate(missing)}
+            self.last_encoded = len(missing)
+
+            if vectors is not None:
+                dim = vectors.shape[1]
+            elif fresh:
+                dim = next(iter(fresh.values())).shape[0]
+            else:
+                dim = 0
+            matrix = np.empty((len(texts), dim), dtype=self.dtype)
+            for row, h in enumerate(hashes):
+                matrix[row] = fresh[h] if h in fresh else vectors[cached[h]]
+
+            self._write(matrix, hashes)
+
+        print(f"Embedding store synced: {len(texts)} rows, {self.last_encoded} new texts encoded.")
+        return np.load(self.vectors_path, mmap_mode="r")
+
+    def _write(self, matrix, hashes):
+        os.makedirs(self.store_dir, exist_ok=True)
+        # Write to temp files and rename so readers never see a half-written store
+        tmp_vectors = self.vectors_path + ".tmp.npy"
+        tmp_manifest = self.manifest_path + ".tmp"
+        np.save(tmp_vectors, matrix)
+        with open(tmp_manifest, "w") as f:
+            json.dump({
+                "model_name": self.model_name,
+                "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+                "dtype": str(matrix.dtype),
+                "hashes": hashes,
+            }, f)
+        os.replace(tmp_vectors, self.vectors_path)
+        os.replace(tmp_manifest, self.manifest_path)
+
+    def _lock(self):
+        return _FileLock(self.lock_path)
+
+    # --- Validation ---
+    def validate(self, texts=None, encode_fn=None, sample_size=16, tolerance=None):
+        """Checks store integrity; optionally re-encodes a sample and compares vectors."""
+        if tolerance is None:
+            tolerance = VALIDATE_TOLERANCE[self.dtype]
+        problems = []
+        manifest, vectors = self.load()
+        if manifest is None:
+            return [f"No usable store at {self.vectors_path} for model {self.model_name}"]
+
+        if not np.all(np.isfinite(vectors)):
+            problems.append("Store contains NaN/inf values")
+
+        if texts is not None:
+            hashes = [text_hash(t) for t in texts]
+            stale = sum(1 for a, b in zip(hashes, manifest["hashes"]) if a != b)
+            stale += abs(len(hashes) - len(manifest["hashes"]))
+            if stale:
+                problems.append(f"{stale} rows out of date with the catalog")
+
+            if encode_fn is not None and not stale and len(texts):
+                rows = np.random.default_rng(0).choice(len(texts), min(sample_size, len(texts)), replace=False)
+                # Round-trip the fresh sample through the same precision as the store
+                fresh = from_storage(to_storage(encode_fn([texts[i] for i in rows]), self.dtype))
+                drift = np.abs(fresh - from_storage(vectors[rows])).max()
+                if drift > tolerance:
+                    problems.append(f"Re-encoded sample drifts from store by {drift:.5f}")
+        return problems
+
+
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+        self.handle = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.handle = open(self.path, "w")
+            fcntl.flock(self.handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self.handle is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+            self.handle.close()
+            self.handle = None
+
+
+# --- CLI: prebuild / validate the store offline ---
+def main():
+    parser = argparse.ArgumentParser(description="Prebuild or validate the product embedding store.")
+    parser.add_argument("command", choices=["build", "validate"])
+    parser.add_argument("--store-dir", default=DEFAULT_STORE_DIR)
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--backend", default=None, help="Encoder backend (torch, int8, onnx)")
+    parser.add_argument("--dtype", default=EMBEDDING_DTYPE, choices=STORAGE_DTYPES)
+    parser.add_argument("--sample", type=int, default=16, help="Rows to re-encode during validate")
+    args = parser.parse_args()
+
+    from models import PRODUCTS
+    from encoders import create_encoder, ENCODER_BACKEND
+
+    texts = [combined_text(p) for p in PRODUCTS]
+    model = create_encoder(args.backend or ENCODER_BACKEND, args.model)
+    store = EmbeddingStore(args.store_dir, model.cache_name, args.dtype)
+
+    if args.command == "build":
+        vectors = store.sync(texts, model.encode)
+        print(f"Store ready: {vectors.shape[0]} x {vectors.shape[1]} at {store.vectors_path}")
+    else:
+        problems = store.validate(texts, model.encode if args.sample else None, sample_size=args.sample)
+        if problems:
+            for p in problems:
+                print(f"FAIL: {p}")
+            raise SystemExit(1)
+        print("Embedding store OK.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Pluggable CPU backends for the sentence encoder.
+
+    torch - SentenceTransformer in full precision (the original path)
+    int8  - the same model with Linear layers dynamically quantized via torch.quantization
+    onnx  - the transformer exported to ONNX and run with onnxruntime (if installed)
+
+Every backend exposes encode(list_of_texts) -> float32 array, like SentenceTransformer.
+
+    python encoders.py parity --backends int8 onnx   # cosine drift + top-k overlap vs float32
+"""
+import os
+import time
+import argparse
+import numpy as np
+
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+ENCODER_BACKEND = os.environ.get("OPTGIFT_ENCODER_BACKEND", "torch")
+ONNX_DIR = os.environ.get("OPTGIFT_ONNX_DIR", "onnx_models")
+
+
+def cache_name(model_name, backend):
+    """Key for the embedding store: vectors from different backends are not interchangeable."""
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+class TorchEncoder:
+    backend = "torch"
+
+    def __init__(self, model_name=DEFAULT_MODEL_NAME):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+
+    @property
+    def cache_name(self):
+        return cache_name(self.model_name, self.backend)
+
+    def encode(self, texts, batch_size=32):
+        return np.asarray(self.model.encode(list(texts), batch_size=batch_size), dtype=np.float32)
+
+
+class QuantizedTorchEncoder(TorchEncoder):
+    backend = "int8"
+
+    def __init__(self, model_name=DEFAULT_MODEL_NAME):
+        super().__init__(model_name)
+        import torch
+        self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxEncoder(TorchEncoder):
+    """Runs the exported transformer graph; pooling + normalization mirror the ST pipeline."""
+    backend = "onnx"
+
+    def __init__(self, model_name=DEFAULT_MODEL_NAME, onnx_dir=ONNX_DIR):
+        import onnxruntime as ort
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        # Loaded once for its tokenizer and pipeline settings (and the export, if needed),
+        # then dropped: inference only runs the ONNX graph
+        st = SentenceTransformer(model_name)
+        path = os.path.join(onnx_dir, f"{model_name.replace('/', '__')}.onnx")
+        if not os.path.exists(path):
+            self._export(st, model_name, path)
+        self.tokenizer = st.tokenizer
+        self.max_length = st.max_seq_length
+        self.normalize = self._has_normalize(st)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    @staticmethod
+    def _has_normalize(st):
+        from sentence_transformers.models import Normalize
+        return any(isinstance(m, Normalize) for m in st)
+
+    @staticmethod
+    def _export(st, model_name, path):
+        import torch
+        print(f"Exporting {model_name} to ONNX ({path})...")
+        transformer = st[0].auto_model.eval()
+        dummy = st.tokenize(["export sample"])
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        names = ["input_ids", "attention_mask", "token_type_ids"]
+        torch.onnx.export(
+            transformer, tuple(dummy[n] for n in names), path,
+            input_names=names, output_names=["last_hidden_state"],
+            dynamic_axes={n: {0: "batch", 1: "seq"} for n in names + ["last_hidden_state"]},
+            opset_version=14,
+        )
+
+    def encode(self, texts, batch_size=32):
+        out = []
+        texts = list(texts)
+        for start in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                                    max_length=self.max_length, return_tensors="np")
+            feeds = {k: v.astype(np.int64) for k, v in tokens.items() if k in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+            # Mean pooling over real tokens
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.normalize:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            out.append(pooled.astype(np.float32))
+        return np.vstack(out) if out else np.empty((0, 0), dtype=np.float32)
+
+
+BACKENDS = {"torch": TorchEncoder, "int8": QuantizedTorchEncoder, "onnx": OnnxEncoder}
+
+
+def create_encoder(backend=ENCODER_BACKEND, model_name=DEFAULT_MODEL_NAME):
+    """Builds the requested backend, falling back to plain torch if its runtime is missing."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend: {backend}")
+    try:
+        return BACKENDS[backend](model_name)
+    except ImportError as e:
+        if backend == "torch":
+            raise
+        print(f"Encoder backend '{backend}' unavailable ({e}); falling back to torch.")
+        return TorchEncoder(model_name)
+
+
+# --- Parity check against the float32 baseline ---
+def parity_report(baseline_vectors, candidate_vectors, baseline_query_vectors, candidate_query_vectors, k=10):
+    from vector_index import normalize, top_k
+    base, cand = normalize(baseline_vectors), normalize(candidate_vectors)
+    row_cos = np.sum(base * cand, axis=1)
+    overlaps = []
+    for qb, qc in zip(normalize(baseline_query_vectors), normalize(candidate_query_vectors)):
+        truth = set(top_k(base @ qb, k).tolist())
+        found = set(top_k(cand @ qc, k).tolist())
+        overlaps.append(len(truth & found) / max(1, len(truth)))
+    return {
+        "mean_cosine": round(float(row_cos.mean()), 5),
+        "min_cosine": round(float(row_cos.min()), 5),
+        "mean_drift": round(float(1 - row_cos.mean()), 5),
+        f"top{k}_overlap": round(float(np.mean(overlaps)), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare encoder backends / storage dtypes against float32.")
+    parser.add_argument("command", choices=["parity"])
+    parser.add_argument("--backends", nargs="+", default=["int8", "onnx"])
+    parser.add_argument("--dtypes", nargs="+", default=["float16", "int8"], help="Storage dtypes to check")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    from models import PRODUCTS
+    from embedding_store import combined_text, to_storage, from_storage
+    texts = [combined_text(p) for p in PRODUCTS]
+    queries = ["birthday gift for mom", "tech gadgets for brother", "anniversary jewellery for wife",
+               "kitchen set for a chef", "travel accessories", "personalized gift for a friend"]
+    queries += texts[::max(1, len(texts) // 20)]
+
+    baseline = TorchEncoder(args.model)
+    start = time.perf_counter()
+    base_vecs = baseline.encode(texts)
+    print(f"torch float32: {len(texts)} texts in {time.perf_counter() - start:.2f}s")
+    base_q = baseline.encode(queries)
+
+    for dtype in args.dtypes:
+        stored = from_storage(to_storage(base_vecs, dtype))
+        report = parity_report(base_vecs, stored, base_q, base_q, args.k)
+        report["bytes_per_vector"] = int(np.dtype(dtype).itemsize * base_vecs.shape[1])
+        print(f"storage {dtype}: {report}")
+
+    for backend in args.backends:
+        try:
+            encoder = BACKENDS[backend](args.model)
+        except ImportError as e:
+            print(f"{backend}: skipped ({e})")
+            continue
+        start = time.perf_counter()
+        vecs = encoder.encode(texts)
+        elapsed = time.perf_counter() - start
+        report = parity_report(base_vecs, vecs, base_q, encoder.encode(queries), args.k)
+        report["encode_seconds"] = round(elapsed, 2)
+        print(f"backend {backend}: {report}")
+
+
+if __name__ == "__main__":
+    main()
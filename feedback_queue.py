@@ -0,0 +1,290 @@
+import os
+import glob
+import json
+import time
+import atexit
+import threading
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import insert, update
+from sqlalchemy.exc import OperationalError, InterfaceError, TimeoutError as PoolTimeout
+from models import db, User, Interaction
+from interaction_store import record_aggregate
+
+
+class QueueFull(Exception):
+    pass
+
+
+class FeedbackQueue:
+    """
+    Write-behind ingestion for /feedback.
+    Requests enqueue an event and return immediately; a background thread bulk-inserts
+    Interaction rows in one transaction per batch and writes only the latest RL weights
+    per user. Flushes happen every `batch_size` events or `flush_interval` seconds.
+
+    durability:
+      'none'    - events live in memory until flushed (lost on crash)
+      'journal' - events are appended to a JSON-lines journal first and replayed on startup
+      'fsync'   - like 'journal' but fsync'ed on every event
+    on_full ('block' or 'reject') controls backpressure once `max_pending` events are queued.
+    on_flush(user_ids), if given, runs after each committed batch (e.g. to drop cached user rows).
+
+    A batch that fails `max_failures` times in a row is retried one event per transaction:
+    events that still fail with a non-transient error (a constraint violation, bad data) go
+    to the `dead_letter_path` JSON-lines file so the rest of the queue can commit. Connection
+    errors never dead-letter; those events stay queued until the database is back.
+    """
+
+    def __init__(self, app, batch_size=100, flush_interval=0.5, max_pending=10000,
+                 durability='journal', journal_path='feedback_journal.jsonl',
+                 on_full='block', full_timeout=2.0, use_aggregates=True, on_flush=None,
+                 max_failures=3, dead_letter_path='feedback_dead_letter.jsonl'):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.durability = durability
+        self.journal_path = journal_path
+        self.on_full = on_full
+        self.full_timeout = full_timeout
+        self.use_aggregates = use_aggregates
+        self.on_flush = on_flush
+        self.max_failures = max_failures
+        self.dead_letter_path = dead_letter_path
+
+        self._events = []
+        self._weights = {}          # user_id -> latest weights JSON not yet written
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._journal = None
+        self._worker = None
+        self._pid = None
+
+        self.flushed = 0
+        self.batches = 0
+        self.rejected = 0
+        self.errors = 0
+        self.dead_lettered = 0
+        self._failures = 0          # consecutive failed flushes of the head batch
+
+    # --- Request side ---
+    def current_weights(self, user_id, stored_weights):
+        """The user's RL weights including updates that are still queued."""
+        with self._cond:
+            return self._weights.get(user_id, stored_weights)
+
+    def submit(self, user_id, product_id, action, new_weights):
+        self._ensure_worker()
+        event = {"user_id": user_id, "product_id": str(product_id), "action": action,
+                 "weights": new_weights, "ts": time.time()}
+        with self._cond:
+            if len(self._events) >= self.max_pending:
+                if self.on_full == 'reject' or not self._cond.wait_for(
+                        lambda: len(self._events) < self.max_pending, timeout=self.full_timeout):
+                    self.rejected += 1
+                    raise QueueFull("Feedback queue is full")
+            self._append_journal(event)
+            self._events.append(event)
+            self._weights[user_id] = new_weights
+            if len(self._events) >= self.batch_size:
+                self._cond.notify_all()
+
+    # --- Worker side ---
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive() and self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._worker is None or not self._worker.is_alive() or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._worker = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._events) >= self.batch_size, timeout=self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Writes everything queued so far in a single transaction."""
+        with self._flush_lock:
+            with self._cond:
+                events = self._events[:self.max_pending]
+            if not events:
+                return 0
+            try:
+                with self.app.app_context():
+                    self._write(events)
+                self._failures = 0
+            except Exception as e:
+                self.errors += 1
+                self._failures += 1
+                if self._failures < self.max_failures:
+                    # Keep the events queued (and journaled); the next flush retries them
+                    print(f"Feedback flush failed, will retry: {e}")
+                    return 0
+                # The same batch keeps failing: isolate the bad events so the rest can commit
+                print(f"Feedback flush failed {self._failures} times, writing events one at a time: {e}")
+                events = events[:self._write_each(events)]
+                if not events:
+                    return 0
+                self._failures = 0
+
+            written = {e["user_id"]: e["weights"] for e in events}
+            if self.on_flush is not None:
+                # Before the queued weights are dropped, so readers never see the old DB value
+                self.on_flush(list(written))
+            with self._cond:
+                del self._events[:len(events)]
+                for user_id, weights in written.items():
+                    if self._weights.get(user_id) == weights:
+                        del self._weights[user_id]
+                self._rewrite_journal(self._events)
+                self._cond.notify_all()
+            self.flushed += len(events)
+            self.batches += 1
+            return len(events)
+
+    def _write(self, events):
+        db.session.execute(insert(Interaction), [
+            {"user_id": e["user_id"], "product_id": e["product_id"], "action_type": e["action"],
+             "timestamp": datetime.utcfromtimestamp(e["ts"])}
+            for e in events
+        ])
+        if self.use_aggregates:
+            counts = Counter((e["user_id"], e["product_id"], e["action"]) for e in events)
+            for (user_id, product_id, action), n in counts.items():
+                record_aggregate(user_id, product_id, action, count=n)
+        # Coalesce RL weight updates: one UPDATE row per user with their latest weights
+        latest = {e["user_id"]: e["weights"] for e in events}
+        db.session.execute(update(User), [{"id": uid, "rl_weights": w} for uid, w in latest.items()])
+        db.session.commit()
+
+    def _write_each(self, events):
+        """
+        Writes events one per transaction, dead-lettering those that fail. Stops at the first
+        connection error. Returns how many events from the head were handled (written or
+        dead-lettered); the rest stay queued.
+        """
+        dead = []
+        handled = 0
+        with self.app.app_context():
+            for event in events:
+                try:
+                    self._write([event])
+                except (OperationalError, InterfaceError, PoolTimeout) as e:
+                    db.session.rollback()
+                    print(f"Feedback database unavailable, keeping {len(events) - handled} events queued: {e}")
+                    break
+                except Exception as e:
+                    db.session.rollback()
+                    dead.append({**event, "error": str(e)})
+                handled += 1
+        if dead:
+            with open(self.dead_letter_path, "a") as f:
+                for event in dead:
+                    f.write(json.dumps(event) + "\n")
+            self.dead_lettered += len(dead)
+            print(f"Moved {len(dead)} failing feedback events to {self.dead_letter_path}")
+        return handled
+
+    # --- Journal ---
+    def _journal_file(self):
+        # One journal per process so gunicorn workers never rewrite each other's events
+        return f"{self.journal_path}.{os.getpid()}"
+
+    def _append_journal(self, event):
+        if self.durability == 'none':
+            return
+        if self._journal is None:
+            self._journal = open(self._journal_file(), "a")
+        self._journal.write(json.dumps(event) + "\n")
+        self._journal.flush()
+        if self.durability == 'fsync':
+            os.fsync(self._journal.fileno())
+
+    def _rewrite_journal(self, remaining):
+        """Drops flushed events from the journal, keeping whatever is still queued."""
+        if self.durability == 'none':
+            return
+        if self._journal is not None:
+            self._journal.close()
+        with open(self._journal_file(), "w") as f:
+            for event in remaining:
+                f.write(json.dumps(event) + "\n")
+        self._journal = open(self._journal_file(), "a")
+
+    def recover(self):
+        """Re-queues events journaled by dead processes that never got flushed."""
+        if self.durability == 'none':
+            return 0
+        events = []
+        for path in glob.glob(f"{self.journal_path}.*"):
+            suffix = path.rsplit(".", 1)[-1]
+            if not suffix.isdigit() or _pid_alive(int(suffix)):
+                continue
+            # Claim the file with an atomic rename so only one worker replays it
+            claimed = f"{path}.claimed"
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue
+            with open(claimed) as f:
+                replayed = [json.loads(line) for line in f if line.strip()]
+            with self._cond:
+                for e in replayed:
+                    self._append_journal(e)
+            os.remove(claimed)
+            events.extend(replayed)
+
+        if events:
+            events.sort(key=lambda e: e["ts"])
+            with self._cond:
+                self._events = events + self._events
+                for e in events:
+                    self._weights[e["user_id"]] = e["weights"]
+            print(f"Recovered {len(events)} unflushed feedback events")
+            self.flush()
+        return len(events)
+
+    def start(self):
+        self.recover()
+        self._ensure_worker()
+        atexit.register(self.close)
+
+    def close(self):
+        """Final flush on shutdown; removes this process's journal if nothing is left in it."""
+        self.flush()
+        with self._cond:
+            if self._events or self.durability == 'none':
+                return
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if os.path.exists(self._journal_file()):
+                os.remove(self._journal_file())
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pending": len(self._events),
+                "pending_users": len(self._weights),
+                "flushed": self.flushed,
+                "batches": self.batches,
+                "rejected": self.rejected,
+                "errors": self.errors,
+                "dead_lettered": self.dead_lettered,
+            }
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
@@ -0,0 +1,134 @@
+from datetime import datetime
+import numpy as np
+from sqlalchemy import select, func, insert, update
+from models import db, User, Interaction, InteractionAggregate
+from cf_model import ACTION_SCORES
+
+# Rows fetched per round trip when streaming aggregates out of the DB
+CHUNK_SIZE = 50000
+
+
+def _source(use_table):
+    if use_table:
+        agg = InteractionAggregate
+        return select(agg.user_id, agg.product_id, agg.action_type, agg.count)
+    return (
+        select(Interaction.user_id, Interaction.product_id, Interaction.action_type, func.count())
+        .group_by(Interaction.user_id, Interaction.product_id, Interaction.action_type)
+    )
+
+
+def load_aggregated_interactions(use_table=False):
+    """
+    One row per (user, product, action) as compact NumPy arrays:
+    (user_ids int64, product_ids str, action_types str, counts int64).
+    The GROUP BY runs in SQL and results are streamed in chunks, so Python memory
+    scales with distinct pairs rather than with the raw interaction history.
+    """
+    user_chunks, product_chunks, action_chunks, count_chunks = [], [], [], []
+    result = db.session.execute(_source(use_table).execution_options(stream_results=True))
+    for chunk in result.partitions(CHUNK_SIZE):
+        users, products, actions, counts = zip(*chunk)
+        user_chunks.append(np.fromiter(users, dtype=np.int64, count=len(users)))
+        product_chunks.append(np.array(products, dtype=str))
+        action_chunks.append(np.array(actions, dtype=str))
+        count_chunks.append(np.fromiter(counts, dtype=np.int64, count=len(counts)))
+
+    if not user_chunks:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, np.empty(0, dtype=str), np.empty(0, dtype=str), empty
+    return (np.concatenate(user_chunks), np.concatenate(product_chunks),
+            np.concatenate(action_chunks), np.concatenate(count_chunks))
+
+
+def load_cf_arrays(use_table=False):
+    """(user_ids, product_ids, scores) ready for CollaborativeModel.fit_arrays."""
+    users, products, actions, _ = load_aggregated_interactions(use_table)
+    scores = np.ones(len(actions), dtype=np.float32)
+    for action, score in ACTION_SCORES.items():
+        scores[actions == action] = score
+    return users, products, scores
+
+
+def record_aggregate(user_id, product_id, action, count=1):
+    """Upserts `count` interactions into the aggregate table (caller commits)."""
+    now = datetime.utcnow()
+    values = dict(user_id=user_id, product_id=str(product_id), action_type=action, count=count, last_seen=now)
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(InteractionAggregate).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'product_id', 'action_type'],
+            set_={'count': InteractionAggregate.count + count, 'last_seen': now},
+        )
+        db.session.execute(stmt)
+        return
+
+    row = InteractionAggregate.query.filter_by(
+        user_id=user_id, product_id=str(product_id), action_type=action).first()
+    if row:
+        row.count += count
+        row.last_seen = now
+    else:
+        db.session.add(InteractionAggregate(**values))
+
+
+def rebuild_aggregates():
+    """Recomputes the aggregate table from the raw Interaction log in one INSERT ... SELECT."""
+    db.session.query(InteractionAggregate).delete()
+    source = (
+        select(Interaction.user_id, Interaction.product_id, Interaction.action_type,
+               func.count(), func.max(Interaction.timestamp))
+        .group_by(Interaction.user_id, Interaction.product_id, Interaction.action_type)
+    )
+    db.session.execute(insert(InteractionAggregate).from_select(
+        ['user_id', 'product_id', 'action_type', 'count', 'last_seen'], source))
+    db.session.commit()
+
+
+def ensure_aggregates():
+    """Backfills the aggregate table the first time it is enabled on an existing database."""
+    has_aggregates = db.session.query(InteractionAggregate.id).first() is not None
+    has_interactions = db.session.query(Interaction.id).first() is not None
+    if has_interactions and not has_aggregates:
+        print("Building interaction aggregate table...")
+        rebuild_aggregates()
+
+
+def rebuild_rl_weights(store, catalog, batch_size=1000):
+    """
+    Recomputes every user's RL weights by replaying the raw Interaction log through
+    store.replay (vectorized across users) and writes them back in batches of
+    `batch_size` users, one bulk UPDATE and commit per batch. Prices come from the
+    current catalog (products no longer listed count as price 0).
+    Returns the ids of the users rewritten.
+    """
+    user_chunks, product_chunks, action_chunks = [], [], []
+    source = (select(Interaction.user_id, Interaction.product_id, Interaction.action_type)
+              .where(Interaction.user_id.is_not(None))
+              .order_by(Interaction.user_id, Interaction.timestamp, Interaction.id))
+    result = db.session.execute(source.execution_options(stream_results=True))
+    for chunk in result.partitions(CHUNK_SIZE):
+        users, products, actions = zip(*chunk)
+        user_chunks.append(np.fromiter(users, dtype=np.int64, count=len(users)))
+        product_chunks.append(np.array(products, dtype=str))
+        action_chunks.append(np.array(actions, dtype=str))
+    if not user_chunks:
+        return []
+
+    # Price per distinct product, then broadcast to the events
+    distinct, inverse = np.unique(np.concatenate(product_chunks), return_inverse=True)
+    rows = [catalog.row_of(pid) for pid in distinct.tolist()]
+    distinct_prices = np.array([catalog.prices[r] if r is not None else 0.0 for r in rows], dtype=np.float64)
+
+    rebuilt = store.replay(np.concatenate(user_chunks), np.concatenate(action_chunks).tolist(),
+                           distinct_prices[inverse])
+    items = list(rebuilt.items())
+    for start in range(0, len(items), batch_size):
+        db.session.execute(update(User), [{"id": uid, "rl_weights": w} for uid, w in items[start:start + batch_size]])
+        db.session.commit()
+    return list(rebuilt)
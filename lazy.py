@@ -0,0 +1,117 @@
+import time
+import threading
+
+
+class NotReady(Exception):
+    """Raised when a lazily-initialized resource is still warming up."""
+    pass
+
+
+class LazySingleton:
+    """
+    Builds an expensive resource (e.g. GiftRecommender) on first use or in a background
+    warm-up thread. Attribute access is proxied to the built object, so callers can keep
+    writing `engine.get_content_based(...)`; while warming, access waits up to
+    `wait_timeout` seconds and then raises NotReady.
+
+    A failed build is retried: the next warm_in_background() or get() after a cooldown of
+    `retry_delay` seconds, doubling per consecutive failure up to `max_retry_delay`.
+    """
+
+    def __init__(self, factory, name="resource", wait_timeout=None, retry_delay=5.0, max_retry_delay=300.0):
+        self._factory = factory
+        self._name = name
+        self._wait_timeout = wait_timeout
+        self._instance = None
+        self._error = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._started_at = None
+        self._failures = 0
+        self._retry_at = None
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.load_seconds = None
+
+    @property
+    def ready(self):
+        return self._ready.is_set() and self._instance is not None
+
+    def status(self):
+        if self.ready:
+            return {"name": self._name, "state": "ready", "load_seconds": self.load_seconds}
+        if self._error is not None and not self._building():
+            return {"name": self._name, "state": "failed", "error": str(self._error), "failures": self._failures,
+                    "retry_in_seconds": round(max(0.0, self._retry_at - time.monotonic()), 1)}
+        if self._started_at is not None:
+            return {"name": self._name, "state": "warming",
+                    "elapsed_seconds": round(time.monotonic() - self._started_at, 1)}
+        return {"name": self._name, "state": "cold"}
+
+    def _build(self):
+        with self._lock:
+            if self._instance is not None:
+                return
+            self._started_at = self._started_at or time.monotonic()
+            try:
+                self._instance = self._factory()
+                self._error = None
+                self._failures = 0
+                self._retry_at = None
+                self.load_seconds = round(time.monotonic() - self._started_at, 2)
+                print(f"{self._name} ready in {self.load_seconds}s")
+            except Exception as e:
+                # Transient failures (model download, locked store file) must not be permanent
+                self._error = e
+                self._failures += 1
+                delay = min(self.retry_delay * 2 ** (self._failures - 1), self.max_retry_delay)
+                self._retry_at = time.monotonic() + delay
+                self._started_at = None
+                print(f"{self._name} failed to load (retry in {delay:g}s): {e}")
+            finally:
+                self._ready.set()
+
+    def _building(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _can_retry(self):
+        return self._retry_at is None or time.monotonic() >= self._retry_at
+
+    def warm_in_background(self):
+        if self._instance is None and not self._building() and self._can_retry():
+            # First warm-up, or the last attempt failed and its cooldown is over
+            self._ready.clear()
+            self._started_at = time.monotonic()
+            self._thread = threading.Thread(target=self._build, name=f"warm-{self._name}", daemon=True)
+            self._thread.start()
+        return self
+
+    def get(self, timeout=None):
+        if self._instance is not None:
+            return self._instance
+        if self._building():
+            if not self._ready.wait(timeout):
+                raise NotReady(f"{self._name} is still loading")
+        elif self._can_retry():
+            # Nobody is warming it (or a failed build's cooldown is over): build on the caller's thread
+            self._build()
+        if self._instance is None:
+            raise NotReady(f"{self._name} failed to load: {self._error}")
+        return self._instance
+
+    def prepare(self, fn):
+        """
+        fn(instance) built off to the side, or None while cold (the factory will build from
+        current data anyway). The live instance keeps serving until swap() publishes it.
+        """
+        instance = self._instance
+        return fn(instance) if instance is not None else None
+
+    def swap(self, instance):
+        """Publishes an instance made by prepare(); readers pick it up on their next access."""
+        with self._lock:
+            self._instance = instance
+
+    def __getattr__(self, name):
+        return getattr(self.get(self._wait_timeout), name)
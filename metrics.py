@@ -0,0 +1,320 @@
+import os
+import sys
+import time
+import random
+import cProfile
+import functools
+import threading
+from contextlib import nullcontext
+
+# OPTGIFT_METRICS=0 turns every timer into a no-op
+METRICS_ENABLED = os.environ.get("OPTGIFT_METRICS", "1") != "0"
+# Latency buckets in seconds (Prometheus' defaults plus a sub-millisecond one)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_DIR = os.environ.get("OPTGIFT_PROFILE_DIR", "profiles")
+# Interval of the stack sampler that runs next to cProfile (seconds)
+PROFILE_SAMPLE_INTERVAL = 0.001
+
+
+# --- Metric types ---
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, values, count) for values, count in self._values.items()]
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label combination."""
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}   # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def samples(self):
+        out = []
+        with self._lock:
+            series = [(values, list(counts)) for values, counts in self._series.items()]
+        for values, counts in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                out.append((self.name + "_bucket", values + (_format_bound(bound),), cumulative))
+            out.append((self.name + "_count", values, cumulative))
+            out.append((self.name + "_sum", values, counts[-1]))
+        return out
+
+
+class Gauge:
+    """Value read from a callback at scrape time (cache sizes, hit rates...)."""
+
+    def __init__(self, name, help_text, read_fn):
+        self.name = name
+        self.help = help_text
+        self.labels = ()
+        self.read_fn = read_fn
+
+    def samples(self):
+        try:
+            return [(self.name, (), float(self.read_fn()))]
+        except Exception:
+            return []
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name, help_text, read_fn):
+        self._metrics[name] = Gauge(name, help_text, read_fn)
+        return self._metrics[name]
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        kinds = {Counter: "counter", Histogram: "histogram", Gauge: "gauge"}
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {kinds[type(metric)]}")
+            label_names = metric.labels + (("le",) if isinstance(metric, Histogram) else ())
+            for name, values, value in metric.samples():
+                names = label_names if name.endswith("_bucket") else metric.labels
+                if values:
+                    pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(names, values))
+                    lines.append(f"{name}{{{pairs}}} {value}")
+                else:
+                    lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Per-process: under serve.py every worker keeps (and serves) its own numbers
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram("optgift_stage_seconds", "Time spent in one stage of a request", ("stage",))
+STAGE_ERRORS = REGISTRY.counter("optgift_stage_errors_total", "Stages that raised", ("stage",))
+REQUEST_SECONDS = REGISTRY.histogram("optgift_http_request_seconds", "Request latency by endpoint",
+                                     ("endpoint", "method"))
+REQUESTS = REGISTRY.counter("optgift_http_requests_total", "Requests by endpoint and status",
+                            ("endpoint", "method", "status"))
+DB_QUERIES = REGISTRY.counter("optgift_db_queries_total", "SQL statements executed")
+DB_SECONDS = REGISTRY.histogram("optgift_db_query_seconds", "SQL statement latency")
+
+
+# --- Stage timers ---
+_trace = threading.local()
+
+
+class _TimedStage:
+    """Context manager that records one stage timing (a class: cheaper than @contextmanager)."""
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if exc_type is not None:
+            STAGE_ERRORS.inc(self.name)
+        STAGE_SECONDS.observe(elapsed, self.name)
+        stages = getattr(_trace, "stages", None)
+        if stages is not None:
+            stages.append((self.name, elapsed))
+        return False
+
+
+_NOOP_STAGE = nullcontext()
+
+
+def stage(name):
+    """`with stage("bert_encode"): ...` times the block into optgift_stage_seconds."""
+    return _TimedStage(name) if METRICS_ENABLED else _NOOP_STAGE
+
+
+def timed(name):
+    """Decorator form of stage()."""
+    def wrap(fn):
+        if not METRICS_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with _TimedStage(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def begin_trace():
+    """Starts collecting this thread's stage timings (for the Server-Timing header)."""
+    _trace.stages = []
+
+
+def end_trace():
+    stages = getattr(_trace, "stages", None)
+    _trace.stages = None
+    return stages or []
+
+
+def traced(fn):
+    """
+    fn bound to the calling thread's trace: stages it times on another thread (a pool
+    worker) still land in this request's Server-Timing. Timings from work that outlives
+    the request are dropped with its trace.
+    """
+    stages = getattr(_trace, "stages", None)
+    if stages is None:
+        return fn
+
+    @functools.wraps(fn)
+    def inner(*args, **kwargs):
+        previous = getattr(_trace, "stages", None)
+        _trace.stages = stages
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _trace.stages = previous
+    return inner
+
+
+def server_timing(stages):
+    """Server-Timing header value; repeated stages are summed."""
+    totals = {}
+    for name, elapsed in stages:
+        totals[name] = totals.get(name, 0.0) + elapsed
+    return ", ".join(f"{name.replace('.', '-')};dur={elapsed * 1000:.2f}" for name, elapsed in totals.items())
+
+
+def track_db_queries():
+    """Counts and times every SQL statement (all engines in the process)."""
+    if not METRICS_ENABLED or getattr(track_db_queries, "installed", False):
+        return
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("optgift_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def _end(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("optgift_query_start")
+        if starts:
+            elapsed = time.perf_counter() - starts.pop()
+            DB_QUERIES.inc()
+            DB_SECONDS.observe(elapsed)
+            stages = getattr(_trace, "stages", None)
+            if stages is not None:
+                stages.append(("db", elapsed))
+
+    track_db_queries.installed = True
+
+
+# --- Opt-in profiling ---
+# The interpreter allows one active cProfile at a time
+_profile_lock = threading.Lock()
+
+
+class RequestProfiler:
+    """
+    cProfile around one request, plus a stack sampler on the same thread.
+    Writes <dir>/<label>.prof (pstats: snakeviz, gprof2dot) and <label>.folded
+    (collapsed stacks: flamegraph.pl, speedscope, inferno).
+    Only one request per process is profiled at a time; start() returns None when busy.
+    """
+
+    def __init__(self, label, out_dir=PROFILE_DIR, interval=PROFILE_SAMPLE_INTERVAL):
+        self.label = label
+        self.out_dir = out_dir
+        self.interval = interval
+        self.profile = cProfile.Profile()
+        self.stacks = {}
+        self._stop = threading.Event()
+        self._thread_id = None
+        self._sampler = None
+
+    def start(self):
+        if not _profile_lock.acquire(blocking=False):
+            return None
+        self._thread_id = threading.get_ident()
+        self._sampler = threading.Thread(target=self._sample, name="request-profiler", daemon=True)
+        self._sampler.start()
+        self.profile.enable()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                key = ";".join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def stop(self):
+        """Stops profiling and writes both files; returns the .prof path."""
+        self.profile.disable()
+        self._stop.set()
+        self._sampler.join()
+        _profile_lock.release()
+        os.makedirs(self.out_dir, exist_ok=True)
+        base = os.path.join(self.out_dir, self.label)
+        self.profile.dump_stats(base + ".prof")
+        with open(base + ".folded", "w") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+        return base + ".prof"
+
+
+def should_profile(flag, sample_rate=0.0):
+    """Profile when the request asked for it or it falls in the random sample."""
+    return flag or (sample_rate > 0 and random.random() < sample_rate)
@@ -2,8 +2,12 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
 import json
-import pandas as pd
 import os
+from catalog import load_catalog
+from rl_weights import DEFAULT_WEIGHTS
+
+# Product catalog location (overridable, e.g. to point benchmarks at a scaled CSV)
+CATALOG_CSV = os.environ.get('OPTGIFT_CATALOG_CSV', 'optgiftai_database.csv')
 
 db = SQLAlchemy()
 
@@ -15,16 +19,21 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(200))
     age = db.Column(db.Integer)
     preferences = db.Column(db.Text, default='{}') 
-    cart = db.Column(db.Text, default='[]')
-    orders = db.Column(db.Text, default='[]')
-    rl_weights = db.Column(db.Text, default=json.dumps({
-        'price_weight': 0.3, 
-        'relevance_weight': 0.7,
-        'novelty_weight': 0.1
-    }))
+    # Legacy JSON blobs, only read by the migration to CartItem / Order (deferred: never loaded otherwise)
+    cart = db.deferred(db.Column(db.Text, default='[]'))
+    orders = db.deferred(db.Column(db.Text, default='[]'))
+    # Kept in step with cart_item rows so the navbar badge needs no query
+    cart_count = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+    rl_weights = db.Column(db.Text, default=json.dumps(DEFAULT_WEIGHTS))
 
 # --- Interaction/Feedback Model ---
 class Interaction(db.Model):
+    __table_args__ = (
+        db.Index('ix_interaction_user_ts', 'user_id', 'timestamp'),
+        db.Index('ix_interaction_product_ts', 'product_id', 'timestamp'),
+        # Covers the (user, product, action) GROUP BY behind the CF loader and aggregate rebuild
+        db.Index('ix_interaction_user_product_action', 'user_id', 'product_id', 'action_type'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     product_id = db.Column(db.String(50)) 
@@ -32,35 +41,47 @@ class Interaction(db.Model):
     rating = db.Column(db.Integer, nullable=True) 
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
-# --- Load Products from CSV ---
-def load_products_from_csv():
-    csv_file = 'optgiftai_database.csv'
-    
-    if not os.path.exists(csv_file):
-        print(f"WARNING: {csv_file} not found. Returning empty list.")
-        return []
+# --- Materialized Interaction Aggregate (kept current by /feedback) ---
+class InteractionAggregate(db.Model):
+    __table_args__ = (db.UniqueConstraint('user_id', 'product_id', 'action_type', name='uq_interaction_aggregate'),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    product_id = db.Column(db.String(50))
+    action_type = db.Column(db.String(20))
+    count = db.Column(db.Integer, default=0)
+    last_seen = db.Column(db.DateTime, default=datetime.utcnow)
 
-    try:
-        df = pd.read_csv('optgiftai_database.csv')
-        products = []
-        for _, row in df.iterrows():
-            products.append({
-                "id": int(row['id']) if pd.notna(row['id']) else 0,
-                "title": row['title'] if pd.notna(row['title']) else "Unknown Product",
-                "rating": float(row['rating']) if pd.notna(row['rating']) else 0.0,  # Ensure this is added
-                "tags": str(row['tags']).split(', ') if pd.notna(row['tags']) else [],
-                "price": float(row['price']) if pd.notna(row['price']) else 0.0,
-                "description": row['description'] if pd.notna(row['description']) else "",
-                "image_url": row['image_url'] if pd.notna(row['image_url']) else "",
-                "vendor": row['vendor'] if pd.notna(row['vendor']) else "Unknown",
-                "link": row['link'] if pd.notna(row['link']) else "#"
-            })
-        return products
+# --- Cart / Order Models ---
+class CartItem(db.Model):
+    __table_args__ = (db.UniqueConstraint('user_id', 'product_id', name='uq_cart_item'),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    product_id = db.Column(db.BigInteger, nullable=False)
+    added_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    except Exception as e:
-        # The SyntaxError was likely due to a missing '}' or ')' above this line
-        print(f"Error loading product database: {e}")
-        return []
+class Order(db.Model):
+    __table_args__ = (db.Index('ix_order_user_created', 'user_id', 'created_at'),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    order_code = db.Column(db.String(40), nullable=False)  # shown to the user, e.g. ORD-17150022
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)  # local time, as orders always showed
+    total = db.Column(db.Float, default=0.0)
+
+class OrderLine(db.Model):
+    # Product fields are copied at purchase time so history survives catalog changes
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
+    product_id = db.Column(db.BigInteger, nullable=False)
+    title = db.Column(db.String(300))
+    vendor = db.Column(db.String(200))
+    image_url = db.Column(db.Text)
+    price = db.Column(db.Float, default=0.0)
+
+# --- Load Products from CSV ---
+def load_products_from_csv():
+    return load_catalog(CATALOG_CSV).records()
 
-# Export the loaded products for app.py and recommender.py
-PRODUCTS = load_products_from_csv()
\ No newline at end of file
+# Export the loaded catalog for app.py and recommender.py.
+# PRODUCTS keeps the list-of-dicts view; use CATALOG for id lookups and batch access.
+CATALOG = load_catalog(CATALOG_CSV)
+PRODUCTS = CATALOG.records()
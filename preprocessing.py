@@ -0,0 +1,90 @@
+import os
+import re
+import threading
+from functools import lru_cache
+
+# Skip NLTK's punkt tokenizer and split on letters with a regex instead
+FAST_TOKENIZER = os.environ.get("OPTGIFT_FAST_TOKENIZER", "0") == "1"
+LEMMA_CACHE_SIZE = 50000
+
+WORD_RE = re.compile(r"[a-z]+")
+
+_resources = None
+_resources_lock = threading.Lock()
+
+
+class _Resources:
+    """NLTK objects built once per process instead of once per query."""
+
+    def __init__(self):
+        self.stop_words = frozenset()
+        self.lemmatize = lambda w: w
+        self.word_tokenize = None
+        missing = []
+        try:
+            from nltk.corpus import stopwords
+            self.stop_words = frozenset(stopwords.words('english'))
+        except (ImportError, LookupError):
+            missing.append('stopwords')
+        try:
+            from nltk.stem import WordNetLemmatizer
+            lemmatizer = WordNetLemmatizer()
+            lemmatizer.lemmatize("warmup")  # forces the lazy WordNet corpus load now
+            self.lemmatize = lemmatizer.lemmatize
+        except (ImportError, LookupError):
+            missing.append('wordnet')
+        try:
+            from nltk.tokenize import word_tokenize
+            word_tokenize("warm up")
+            self.word_tokenize = word_tokenize
+        except (ImportError, LookupError):
+            missing.append('punkt')
+        if missing:
+            print(f"NLTK data missing ({', '.join(missing)}); degrading gracefully. Run `python bootstrap.py nltk`.")
+
+
+def _get_resources():
+    global _resources
+    if _resources is None:
+        with _resources_lock:
+            if _resources is None:
+                _resources = _Resources()
+    return _resources
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemmatize(token):
+    return _get_resources().lemmatize(token)
+
+
+def tokenize(text, fast=None):
+    res = _get_resources()
+    if fast is None:
+        fast = FAST_TOKENIZER
+    if fast or res.word_tokenize is None:
+        return WORD_RE.findall(text.lower())
+    return res.word_tokenize(text.lower())
+
+
+def preprocess_query(text, fast=None):
+    if not text:
+        return ""
+    stop_words = _get_resources().stop_words
+
+    # Tokenize and Lowercase
+    tokens = tokenize(text, fast)
+
+    # Remove Stopwords and non-alphabetic characters
+    filtered_tokens = [w for w in tokens if w.isalpha() and w not in stop_words]
+
+    # Lemmatization (Converts 'books' to 'book'), memoized per token
+    return " ".join(lemmatize(w) for w in filtered_tokens)
+
+
+def preprocess_many(texts, fast=None):
+    """Batch API: preprocesses many queries, sharing the stopword set and lemma cache."""
+    return [preprocess_query(t, fast) for t in texts]
+
+
+def cache_info():
+    return lemmatize.cache_info()._asdict()
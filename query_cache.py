@@ -0,0 +1,74 @@
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def normalize_query(query):
+    """Cache key for a query: lowercased with whitespace collapsed, so 'Books ' and 'books'
+    share a key. Nothing more: the key must identify the text that was encoded. Only
+    normal-mode searches go through preprocess_query in app.py first (advanced-mode and
+    API queries arrive raw), so 'Gifts for mom!' and 'gift for mom' are separate entries."""
+    return " ".join(str(query).lower().split())
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded, thread-safe LRU cache of query embeddings with an optional TTL.
+    Repeated/popular searches skip the transformer forward pass entirely.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query):
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                vector, stored_at = entry
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, query, vector):
+        vector = np.array(vector, dtype=np.float32)
+        vector.setflags(write=False)  # Shared between requests, so keep it read-only
+        key = normalize_query(query)
+        with self._lock:
+            self._data[key] = (vector, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return vector
+
+    def get_or_encode(self, query, encode_fn):
+        """Returns the cached embedding for `query`, encoding the normalized text on a miss."""
+        vector = self.get(query)
+        if vector is None:
+            vector = self.put(query, np.asarray(encode_fn([normalize_query(query)]))[0])
+        return vector
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,155 @@
+import os
+import json
+import numpy as np
+from results import RankedResults
+from vector_index import top_k as top_k_indices
+from rl_weights import weight_vector, weighted_scores
+from metrics import stage
+
+# Optional JSON file of extra / overriding ranker configs ({"name": {"kind": ..., ...}})
+RANKERS_FILE = os.environ.get("OPTGIFT_RANKERS_FILE")
+
+
+class Candidates:
+    """
+    Output of one retrieval pass, shared by every ranker of a rank_many() call:
+    candidate catalog rows, their cosine similarity to the query, metadata match flags,
+    plus the per-user inputs (user id, CF model, RL weight vector) personalized rankers read.
+    """
+    __slots__ = ("catalog", "rows", "semantic", "occasion_match", "relationship_match",
+                 "user_id", "cf_model", "weights", "_cf_scores")
+
+    def __init__(self, catalog, rows, semantic, occasion_match, relationship_match,
+                 user_id=None, cf_model=None, weights=None):
+        self.catalog = catalog
+        self.rows = rows
+        self.semantic = semantic
+        self.occasion_match = occasion_match
+        self.relationship_match = relationship_match
+        self.user_id = user_id
+        self.cf_model = cf_model
+        self.weights = weights
+        self._cf_scores = None
+
+    def cf_scores(self):
+        """CF score per candidate (0 where unknown), or None before the first training run."""
+        if self._cf_scores is None and self.cf_model is not None:
+            self._cf_scores = self.cf_model.score_products(self.user_id, self.catalog.ids[self.rows].tolist())
+        return self._cf_scores
+
+
+# --- Ranker kinds: fn(candidates, config, top_k) -> RankedResults ---
+RANKER_KINDS = {}
+
+
+def ranker_kind(name):
+    """Registers a scoring function that ranker configs can refer to by `kind`."""
+    def register(fn):
+        RANKER_KINDS[name] = fn
+        return fn
+    return register
+
+
+def _ranked(candidates, scores, config, top_k):
+    best = top_k_indices(scores, top_k)
+    return RankedResults.from_scores(candidates.catalog, candidates.rows[best], scores[best], config["label"])
+
+
+@ranker_kind("semantic")
+def rank_semantic(candidates, config, top_k):
+    return _ranked(candidates, candidates.semantic, config, top_k)
+
+
+@ranker_kind("metadata_fusion")
+def rank_metadata_fusion(candidates, config, top_k):
+    scores = (config.get("semantic_weight", 0.75) * candidates.semantic
+              + config.get("occasion_boost", 0.15) * candidates.occasion_match
+              + config.get("relationship_boost", 0.10) * candidates.relationship_match)
+    return _ranked(candidates, scores, config, top_k)
+
+
+@ranker_kind("cf_blend")
+def rank_cf_blend(candidates, config, top_k):
+    weight = config.get("cf_weight", 0.3)
+    cf = candidates.cf_scores()
+    if cf is None:
+        return _ranked(candidates, candidates.semantic, config, top_k)
+    # CF on the confidence scale the CF list uses (score * 10 + 50 percent)
+    scores = (1.0 - weight) * candidates.semantic + weight * (cf * 0.1 + 0.5)
+    return _ranked(candidates, scores, config, top_k)
+
+
+def rl_features(candidates):
+    """
+    Relevance (cosine), price (cheaper within the pool scores higher) and novelty (less
+    globally popular scores higher) per candidate: the inputs of rl_weights.weighted_scores.
+    """
+    prices = candidates.catalog.prices[candidates.rows]
+    top_price = prices.max() if prices.size else 0.0
+    price_score = 1.0 - prices / top_price if top_price > 0 else np.zeros_like(prices)
+
+    novelty = np.full(candidates.rows.shape[0], 0.5)
+    popularity = None
+    if candidates.cf_model is not None:
+        popularity = candidates.cf_model.score_products(None, candidates.catalog.ids[candidates.rows].tolist())
+    if popularity is not None and np.ptp(popularity) > 0:
+        novelty = 1.0 - (popularity - popularity.min()) / np.ptp(popularity)
+    return candidates.semantic, price_score, novelty
+
+
+@ranker_kind("rl_weighted")
+def rank_rl_weighted(candidates, config, top_k):
+    """The user's RL weights applied to the candidates (config "weights" or defaults without a user)."""
+    weights = weight_vector(candidates.weights if candidates.weights is not None else config.get("weights"))
+    return _ranked(candidates, weighted_scores(weights, *rl_features(candidates)), config, top_k)
+
+
+# --- Declarative configs: a new strategy is a new entry, no new retrieval pass ---
+RANKERS = {
+    "content": {"kind": "semantic", "label": "Content based"},
+    "hybrid": {"kind": "metadata_fusion", "semantic_weight": 0.75, "occasion_boost": 0.15,
+               "relationship_boost": 0.10, "label": "Hybrid (Semantic + Metadata)"},
+    "blend": {"kind": "cf_blend", "cf_weight": 0.3, "label": "Hybrid (Semantic + CF)"},
+    "rl": {"kind": "rl_weighted", "label": "Personalized (RL weights)"},
+}
+# Rankers whose lists differ per user (cache them per user)
+PERSONAL_KINDS = {"cf_blend", "rl_weighted"}
+
+
+def load_ranker_configs(path=RANKERS_FILE):
+    """Merges ranker configs from a JSON file into RANKERS (unknown kinds are rejected)."""
+    if not path:
+        return RANKERS
+    with open(path) as f:
+        extra = json.load(f)
+    for name, config in extra.items():
+        if config.get("kind") not in RANKER_KINDS:
+            raise ValueError(f"Ranker {name!r}: unknown kind {config.get('kind')!r}")
+        RANKERS[name] = {"label": name, **config}
+    return RANKERS
+
+
+def resolve(ranker):
+    """(name, config) for a ranker name or an inline config dict with a "name" key."""
+    if isinstance(ranker, dict):
+        return ranker.get("name") or ranker["kind"], {"label": ranker.get("name", ranker["kind"]), **ranker}
+    if ranker not in RANKERS:
+        raise KeyError(f"Unknown ranker: {ranker}")
+    return ranker, RANKERS[ranker]
+
+
+def is_personal(ranker):
+    return resolve(ranker)[1]["kind"] in PERSONAL_KINDS
+
+
+def run_rankers(candidates, rankers, top_k):
+    """{name: RankedResults}, every ranker scoring the same candidate pool."""
+    results = {}
+    for ranker in rankers:
+        name, config = resolve(ranker)
+        with stage(f"rank_{name}"):
+            results[name] = RANKER_KINDS[config["kind"]](candidates, config, top_k)
+    return results
+
+
+load_ranker_configs()
@@ -1,169 +1,245 @@
 import pandas as pd
-import json
-import random
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.decomposition import TruncatedSVD
-from collections import Counter
+import numpy as np
+import copy
+import multiprocessing
+from embedding_store import EmbeddingStore, combined_text, DEFAULT_STORE_DIR, DEFAULT_MODEL_NAME, EMBEDDING_DTYPE
+from encoders import create_encoder, cache_name, ENCODER_BACKEND
+from vector_index import load_or_build_index, refresh_index, normalize, top_k as top_k_indices
+from query_cache import QueryEmbeddingCache
+from batching_encoder import BatchingEncoder
+from cf_model import CollaborativeModel
+from catalog import Catalog
+from results import RankedResults
+from rankers import Candidates, run_rankers
+from rl_weights import update_rl_weights
+from metrics import stage
+import os
+
+# "flat" (exact), "ivf" (approximate) or "auto" (ivf for large catalogs)
+VECTOR_INDEX_KIND = os.environ.get("OPTGIFT_VECTOR_INDEX", "auto")
+QUERY_CACHE_SIZE = int(os.environ.get("OPTGIFT_QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.environ.get("OPTGIFT_QUERY_CACHE_TTL", "3600"))
+# Micro-batching of concurrent query encodes (window 0 disables batching)
+BATCH_WINDOW_MS = float(os.environ.get("OPTGIFT_BATCH_WINDOW_MS", "2"))
+BATCH_MAX_SIZE = int(os.environ.get("OPTGIFT_BATCH_MAX_SIZE", "32"))
+# Hybrid pool: BERT candidates plus up to this many metadata-matched products
+HYBRID_CANDIDATES = 50
+METADATA_CANDIDATES = 200
+
+# --- Read-only data shared by preforked workers (see serve.py) ---
+class SharedData:
+    """Catalog, embedding matrix and vector index loaded once in the parent process."""
+    __slots__ = ("catalog", "store_name", "dtype", "embeddings", "index")
+
+    def __init__(self, catalog, store_name, dtype, embeddings, index):
+        self.catalog = catalog
+        self.store_name = store_name
+        self.dtype = dtype
+        self.embeddings = embeddings
+        self.index = index
+
+    def matches(self, catalog, store, index_kind):
+        return (self.catalog is catalog and self.store_name == store.model_name and self.dtype == store.dtype
+                and index_kind in ("auto", self.index.kind))
+
+
+_shared_data = None
+
+
+def _sync_store(store_dir, model_name, backend, dtype, texts):
+    encoder = create_encoder(backend, model_name)
+    EmbeddingStore(store_dir, encoder.cache_name, dtype).sync(texts, encoder.encode)
+
+
+def preload_shared_data(catalog, store_dir=DEFAULT_STORE_DIR, model_name=DEFAULT_MODEL_NAME, index_kind=VECTOR_INDEX_KIND,
+                        encoder_backend=ENCODER_BACKEND, embedding_dtype=EMBEDDING_DTYPE):
+    """
+    Loads everything a GiftRecommender needs except the model, so a preforking parent can
+    hand it to workers copy-on-write. GiftRecommenders built in this process (or its forks)
+    for the same catalog pick it up instead of loading their own copy.
+    """
+    global _shared_data
+    records = catalog.records()  # build the cached dicts before fork, not once per worker
+    texts = [combined_text(p) for p in records]
+    store = EmbeddingStore(store_dir, cache_name(model_name, encoder_backend), embedding_dtype)
+    vectors = store.load_current(texts)
+    if vectors is None:
+        # Encoding needs the model: do it in a throwaway process so the parent never loads torch
+        print("Embedding store out of date; encoding in a helper process...")
+        proc = multiprocessing.Process(target=_sync_store,
+                                       args=(store_dir, model_name, encoder_backend, embedding_dtype, texts))
+        proc.start()
+        proc.join()
+        vectors = store.load_current(texts)
+        if vectors is None:
+            raise RuntimeError(f"Could not build the embedding store (helper exit code {proc.exitcode})")
+
+    index = load_or_build_index(vectors, store.index_path, index_kind, dtype=embedding_dtype)
+    _shared_data = SharedData(catalog, store.model_name, embedding_dtype, vectors, index)
+    return _shared_data
+
 
 class GiftRecommender:
-    def __init__(self, products):
-        self.products = products
-        self.df = pd.DataFrame(products)
-        
-        print("Loading BERT model...")
-        self.bert_model = SentenceTransformer('all-MiniLM-L6-v2')
+    def __init__(self, products, store_dir=DEFAULT_STORE_DIR, model_name=DEFAULT_MODEL_NAME, index_kind=VECTOR_INDEX_KIND,
+                 cf_model=None, encoder_backend=ENCODER_BACKEND, embedding_dtype=EMBEDDING_DTYPE):
+        # Accepts a Catalog or a plain list of product dicts
+        self.catalog = products if isinstance(products, Catalog) else Catalog.from_records(products)
+        self.products = self.catalog.records()
         
-        # --- Use Title and Tags for recommendations ---
-        self.df["combined_text"] = (
-            self.df["title"].fillna("") + " " + 
-            self.df["description"].fillna("") + " " + 
-            self.df["tags"].apply(lambda x: " ".join(x) if isinstance(x, list) else str(x))
-        )
+        print(f"Loading BERT model ({encoder_backend} backend)...")
+        self.model_name = model_name
+        self.bert_model = create_encoder(encoder_backend, model_name)
         
-        # Pre-compute embeddings for semantic search
-        self.product_embeddings = self.bert_model.encode(self.df["combined_text"].tolist())
-        print("Product Embeddings generated using Title and Tags.")
+        # Pre-compute embeddings for semantic search (cached on disk, only new/changed rows re-encoded)
+        # Keyed by backend too: quantized/ONNX vectors are not interchangeable with float32 ones
+        self.embedding_store = EmbeddingStore(store_dir, self.bert_model.cache_name, embedding_dtype)
+        shared = _shared_data
+        if shared is not None and shared.matches(self.catalog, self.embedding_store, index_kind):
+            # Preforked worker: embeddings and index were loaded once by the parent (serve.py)
+            self.product_embeddings = shared.embeddings
+            self.index = shared.index
+            print(f"Using preloaded embeddings and {self.index.kind} index ({len(self.index)} rows).")
+        else:
+            # --- Use Title and Tags for recommendations ---
+            texts = [combined_text(p) for p in self.products]
+            self.product_embeddings = self.embedding_store.sync(texts, self.bert_model.encode)
+            print("Product Embeddings loaded using Title and Tags.")
+
+            # Nearest-neighbour index over the embeddings (persisted next to the store)
+            self.index = load_or_build_index(self.product_embeddings, self.embedding_store.index_path, index_kind,
+                                             dtype=embedding_dtype)
+            print(f"Vector index ready ({self.index.kind}, {self.index.dtype}, {len(self.index)} rows).")
+
+        # Query embeddings are reused across rankers and requests
+        self.query_cache = QueryEmbeddingCache(maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL)
+        self.batch_encoder = None
+        if BATCH_WINDOW_MS > 0:
+            self.batch_encoder = BatchingEncoder(self.bert_model.encode, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_WINDOW_MS)
+
+        # Collaborative filtering model, trained off the request path (may be shared with app.py)
+        self.cf_model = cf_model if cf_model is not None else CollaborativeModel()
+
+    def with_catalog(self, catalog):
+        """
+        A recommender for a new catalog version that shares this one's model, caches and CF
+        model. Only texts the embedding store has not seen are encoded; the index is rebuilt
+        (IVF keeps its centroids). The current instance stays fully usable meanwhile.
+        """
+        clone = copy.copy(self)
+        clone.catalog = catalog
+        clone.products = catalog.records()
+        texts = [combined_text(p) for p in clone.products]
+        clone.product_embeddings = self.embedding_store.sync(texts, self.bert_model.encode)
+        clone.index = refresh_index(self.index, clone.product_embeddings, self.embedding_store.index_path)
+        return clone
+
+    @property
+    def df(self):
+        # Built on demand; serving only needs the catalog's columns
+        df = pd.DataFrame(self.products)
+        df["combined_text"] = [combined_text(p) for p in self.products]
+        return df
+
+    def encode_query(self, query):
+        encode_fn = self.batch_encoder.encode if self.batch_encoder else self.bert_model.encode
+
+        def timed_encode(texts):
+            # Only cache misses reach the model
+            with stage("bert_encode"):
+                return encode_fn(texts)
+        return self.query_cache.get_or_encode(query, timed_encode)
         
     def get_content_based(self, query, top_k=8):
         # Encode the User's Query into the same Vector Space
-        query_embedding = self.bert_model.encode([query])
-        # Calculate Cosine Similarity
-        similarities = cosine_similarity(query_embedding, self.product_embeddings).flatten()
-        # Get Top-K Indices
-        top_indices = similarities.argsort()[-top_k:][::-1]
-        results = []
-        for idx in top_indices:
-            product = self.products[idx].copy()
-            product['confidence'] = round(float(similarities[idx]) * 100, 1)
-            product['model_used'] = "Content based"
-            results.append(product)
-        return results
-
-    def get_collaborative_based(self, interactions, top_k=8):
+        query_embedding = self.encode_query(query)
+        # Top-K by Cosine Similarity through the vector index
+        with stage("vector_search"):
+            top_indices, similarities = self.index.search(query_embedding, top_k)
+        return RankedResults.from_scores(self.catalog, top_indices, similarities, "Content based")
+
+    def get_collaborative_based(self, interactions=None, top_k=8, user_id=None):
         """
         Algo: Matrix Factorization (SVD).
         Finds latent patterns in user behavior (e.g., "Users who bought X also bought Y").
+        Reads the latest precomputed CF snapshot; uses the user's own row when we have one,
+        otherwise the global trend.
         """
-        if not interactions or len(interactions) < 5:
-            return self.get_random_recommendations(top_k, "Collaborative (Cold Start)")
+        if self.cf_model.snapshot is None and interactions:
+            # No background trainer has produced a snapshot yet: train once inline
+            with stage("cf_train"):
+                self.cf_model.fit(interactions)
 
-        # 1. Build Interaction Matrix (Rows=Users, Cols=Products)
-        product_ids = sorted(list(set(i.product_id for i in interactions)))
-        user_ids = sorted(list(set(i.user_id for i in interactions)))
-        
-        # Map IDs to Matrix Indices
-        prod_map = {pid: i for i, pid in enumerate(product_ids)}
-        user_map = {uid: i for i, uid in enumerate(user_ids)}
-        
-        # Create Matrix
-        matrix = np.zeros((len(user_ids), len(product_ids)))
-        for i in interactions:
-            if i.product_id in prod_map and i.user_id in user_map:
-                # Score: Purchase=5, Like=3, Dislike=-1
-                score = 5 if i.action_type == 'purchase' else (3 if i.action_type == 'like' else 1)
-                matrix[user_map[i.user_id]][prod_map[i.product_id]] = score
-
-        # 2. Apply SVD (Singular Value Decomposition)
-        # Reduces noise and fills in "blank spots" with predictions
         try:
-            n_components = min(10, len(product_ids)-1) # Ensure valid dimensions
-            svd = TruncatedSVD(n_components=n_components, random_state=42)
-            matrix_reduced = svd.fit_transform(matrix)
-            matrix_reconstructed = svd.inverse_transform(matrix_reduced)
-            
-            # Sum up predicted scores for all products (Global Trend). In a real user session, we would look at a specific user's row.
-            # Here, we show globally trending items based on latent features.
-            avg_scores = matrix_reconstructed.mean(axis=0)
-            
-            # Get Top Indices
-            top_indices = avg_scores.argsort()[-top_k:][::-1]
-            
-            results = []
-            for idx in top_indices:
-                real_pid = product_ids[idx]
-                # Match the ID as a string to the database ID
-                prod = next((p for p in self.products if str(p['id']) == real_pid), None)
-                if prod:
-                    p_copy = prod.copy()
-                    # Ensure the rating from the CSV is included in the dictionary
-                    p_copy['rating'] = prod.get('rating', 0.0) 
-                    p_copy['confidence'] = round(float(avg_scores[idx]) * 10 + 50, 1)
-                    p_copy['model_used'] = "SVD Matrix Factorization"
-                    results.append(p_copy)
-            return results
-            
+            with stage("cf_recommend"):
+                ranked = self.cf_model.recommend(user_id, top_k)
         except Exception as e:
             print(f"SVD Error (Falling back to popularity): {e}")
             return self.get_random_recommendations(top_k, "Fallback Popularity")
 
+        if ranked is None:
+            return self.get_random_recommendations(top_k, "Collaborative (Cold Start)")
+
+        # Interaction IDs are strings; the catalog index coerces them (unknown ids are dropped)
+        product_ids, scores = ranked
+        rows = np.fromiter((-1 if r is None else r for r in map(self.catalog.row_of, product_ids)),
+                           dtype=np.int64, count=len(product_ids))
+        known = rows >= 0
+        return RankedResults.from_scores(self.catalog, rows[known], np.asarray(scores)[known],
+                                         "SVD Matrix Factorization", scale=10.0, offset=50.0)
+
     def update_rl_weights(self, current_weights_json, action, product_price):
+        # Kept for compatibility; the logic lives in rl_weights so /feedback need not load BERT
+        return update_rl_weights(current_weights_json, action, product_price)
+
+    def get_hybrid_based(self, query, occasion=None, relationship=None, top_k=20):
+        return self.rank_many(query, ["hybrid"], occasion, relationship, top_k)["hybrid"]
+
+    # --- Multi-ranker pipeline ---
+    def retrieve(self, query, occasion=None, relationship=None, pool=HYBRID_CANDIDATES, user_id=None, weights=None):
         """
-        RL Algo : The Reinforcement Learning (RL) Feedback Loop.
-        Adjusts weights dynamically based on user actions.
+        The shared candidate-generation stage: encode the query once, take the top `pool`
+        semantic candidates from the index, add strong metadata matches even when BERT ranks
+        them low, and score every candidate's cosine similarity once.
         """
-        # Parse JSON if needed
-        if isinstance(current_weights_json, str):
-            weights = json.loads(current_weights_json)
-        else:
-            weights = current_weights_json.copy()
+        query_embedding = normalize(self.encode_query(query))[0]
+        with stage("vector_search"):
+            rows, _ = self.index.search(query_embedding, pool)
 
-        # Learning Rate (How fast the AI adapts)
-        alpha = 0.05 
+        with stage("candidate_retrieval"):
+            # Metadata matches as boolean masks over the whole catalog (inverted index lookups)
+            no_match = np.zeros(len(self.catalog), dtype=bool)
+            occasion_mask = self.catalog.match_mask(occasion)
+            relationship_mask = self.catalog.match_mask(relationship)
+            occasion_mask = no_match if occasion_mask is None else occasion_mask
+            relationship_mask = no_match if relationship_mask is None else relationship_mask
 
-        # Logic:
-        # If 'like'/'purchase': Trust relevance more, trust price point.
-        # If 'dislike': Increase novelty (show different things), reduce relevance trust.
-        
-        if action in ['like', 'purchase']:
-            weights['relevance_weight'] = min(1.0, weights['relevance_weight'] + alpha)
-            weights['novelty_weight'] = max(0.0, weights['novelty_weight'] - alpha)
-            # If they buy expensive, increase tolerance for price
-            if product_price > 1000:
-                weights['price_weight'] = max(0.1, weights['price_weight'] - alpha) 
-        
-        elif action == 'dislike':
-            weights['relevance_weight'] = max(0.1, weights['relevance_weight'] - alpha)
-            weights['novelty_weight'] = min(0.5, weights['novelty_weight'] + alpha)
-        
-        return json.dumps(weights)
+            # Strong metadata matches join the pool even when BERT ranks them low
+            # (both > occasion only > relationship only when there are too many)
+            priority = 2 * occasion_mask.astype(np.int8) + relationship_mask
+            matched = np.flatnonzero(priority)
+            if matched.size:
+                if matched.size > METADATA_CANDIDATES:
+                    matched = matched[top_k_indices(priority[matched], METADATA_CANDIDATES)]
+                rows = np.union1d(rows, matched)
+            rows = np.asarray(rows, dtype=np.int64)
 
-    def get_hybrid_based(self, query, occasion=None, relationship=None, top_k=20):
-        	
-        query_embedding = self.bert_model.encode([query])
-        bert_scores = cosine_similarity( query_embedding, self.product_embeddings).flatten()
-	
-		# Get top 50 semantic candidates
-        candidate_indices = bert_scores.argsort()[-50:][::-1]
-	
-        results = []
-	
-        for idx in candidate_indices:
-            score = float(bert_scores[idx])
-            prod = self.products[idx]
-            text_context = (prod["title"] + " " + " ".join(prod["tags"])).lower()
-	
-            occasion_match = 1 if occasion and occasion.lower() in text_context else 0
-            relationship_match = 1 if relationship and relationship.lower() in text_context else 0
-	
-			# Proper weighted fusion
-            final_score = ( 0.75 * score + 0.15 * occasion_match + 0.10 * relationship_match )
-	
-            results.append({**prod, "confidence": round(final_score * 100, 1), "model_used": "Hybrid (Semantic + Metadata)"
-				}
-			)
-        return sorted(results, key=lambda x: x["confidence"], reverse=True)[:top_k]
+            semantic = normalize(self.product_embeddings[rows]) @ query_embedding
+            return Candidates(self.catalog, rows, semantic, occasion_mask[rows], relationship_mask[rows],
+                              user_id=user_id, cf_model=self.cf_model, weights=weights)
+
+    def rank_many(self, query, rankers=("content", "hybrid"), occasion=None, relationship=None, top_k=20,
+                  user_id=None, weights=None):
+        """
+        Several ranked lists from one retrieval pass: {ranker name: RankedResults}.
+        `rankers` are names from rankers.RANKERS or inline config dicts
+        ({"name": ..., "kind": ..., params}); `weights` are the user's RL weights.
+        """
+        candidates = self.retrieve(query, occasion, relationship, max(HYBRID_CANDIDATES, top_k), user_id, weights)
+        return run_rankers(candidates, rankers, top_k)
 
     def update_model_with_interactions(self, interactions):
-        # Stub for compatibility (SVD calculates on the fly, so no training loop needed here)
-        pass
+        # Synchronous retrain; normally the background trainer (cf_model.start_background) does this
+        return self.cf_model.fit(interactions)
 
     def get_random_recommendations(self, k, model_name):
-        selected = random.sample(self.products, min(k, len(self.products)))
-        results = []
-        for p in selected:
-            p_copy = p.copy()
-            p_copy['confidence'] = 50.0
-            p_copy['model_used'] = model_name
-            results.append(p_copy)
-        return results
\ No newline at end of file
+        return RankedResults.random(self.catalog, k, model_name)
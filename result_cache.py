@@ -0,0 +1,120 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from query_cache import normalize_query
+
+
+class RecommendationCache:
+    """
+    Bounded, thread-safe LRU + TTL cache of finished recommendation lists.
+
+    Keys are (user, mode, normalized query, occasion, relationship, top_k, catalog version,
+    CF version). Lists that do not depend on the user (content, hybrid, the CF global trend)
+    use user=None and are shared by everyone. A retrained CF model or a reloaded catalog
+    changes the versions, so stale entries are never hit and simply age out; per-user entries
+    are dropped explicitly on feedback and preference changes.
+
+    Cached lists are shared between requests: treat them as read-only.
+    """
+
+    def __init__(self, maxsize=4096, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._by_user = {}
+        self._lock = threading.Lock()
+        self._warmer = None
+        self._warmer_pid = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(user_id, mode, query, occasion, relationship, top_k, catalog_version, cf_version):
+        return (user_id, mode, normalize_query(query or ""), normalize_query(occasion or ""),
+                normalize_query(relationship or ""), top_k, catalog_version, cf_version)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._discard(key)
+            self.misses += 1
+            return None
+
+    def peek(self, key):
+        """Like get(), but leaves recency and hit statistics alone (for fallbacks)."""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry[0] if entry is not None else None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            if key[0] is not None:
+                self._by_user.setdefault(key[0], set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._discard(next(iter(self._data)))
+        return value
+
+    def get_or_compute(self, key, compute_fn):
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, compute_fn())
+        return value
+
+    def _discard(self, key):
+        self._data.pop(key, None)
+        keys = self._by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[key[0]]
+
+    # --- Invalidation ---
+    def invalidate_user(self, user_id):
+        """Drops a user's personal entries (after feedback or a preference change)."""
+        with self._lock:
+            for key in self._by_user.pop(user_id, ()):
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._by_user.clear()
+
+    # --- Background precompute ---
+    def start_warmer(self, warm_fn, interval=30.0):
+        """Calls `warm_fn()` every `interval` seconds in a daemon thread (once per process)."""
+        if self._warmer is not None and self._warmer.is_alive() and self._warmer_pid == os.getpid():
+            return
+
+        def run():
+            while True:
+                try:
+                    warm_fn()
+                except Exception as e:
+                    print(f"Recommendation precompute failed: {e}")
+                time.sleep(interval)
+
+        self._warmer_pid = os.getpid()
+        self._warmer = threading.Thread(target=run, name="rec-cache-warmer", daemon=True)
+        self._warmer.start()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "users": len(self._by_user),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
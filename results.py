@@ -0,0 +1,150 @@
+import json
+import random
+import base64
+import binascii
+import numpy as np
+from catalog import coerce_id
+
+
+class ProductView:
+    """
+    One ranked product: a catalog row plus its confidence and model label, without
+    copying the row dict. Reads like the old result dicts (prod.title, prod['price'],
+    prod.get('tags')), so templates and JSON code need no changes.
+    """
+    __slots__ = ("_record", "confidence", "model_used")
+
+    def __init__(self, record, confidence, model_used):
+        self._record = record
+        self.confidence = confidence
+        self.model_used = model_used
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)  # e.g. _record itself before __init__ (copy/pickle)
+        try:
+            return self._record[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __getitem__(self, key):
+        if key == "confidence":
+            return self.confidence
+        if key == "model_used":
+            return self.model_used
+        return self._record[key]
+
+    def __contains__(self, key):
+        return key in ("confidence", "model_used") or key in self._record
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self._record.keys()) + ["confidence", "model_used"]
+
+    def to_dict(self):
+        return {**self._record, "confidence": self.confidence, "model_used": self.model_used}
+
+    def __repr__(self):
+        return f"ProductView(id={self._record.get('id')}, confidence={self.confidence}, model_used={self.model_used!r})"
+
+
+class RankedResults:
+    """
+    A ranked recommendation list kept as NumPy arrays: catalog row numbers, best first,
+    and their confidences. Ranking and fusion only ever touch these arrays; a
+    ProductView is made when an item is actually read (the template loop), so work per
+    request scales with the rows rendered, not the candidate pool.
+
+    Holds the catalog it was ranked against, so cached lists stay valid across reloads.
+    """
+    __slots__ = ("catalog", "rows", "confidences", "model_used")
+
+    def __init__(self, catalog, rows, confidences, model_used):
+        self.catalog = catalog
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.confidences = np.round(np.asarray(confidences, dtype=np.float64), 1)
+        self.model_used = model_used
+
+    @classmethod
+    def from_scores(cls, catalog, rows, scores, model_used, scale=100.0, offset=0.0):
+        """Confidence = score * scale + offset, computed for the whole list at once."""
+        return cls(catalog, rows, np.asarray(scores, dtype=np.float64) * scale + offset, model_used)
+
+    @classmethod
+    def random(cls, catalog, k, model_used, confidence=50.0):
+        """k random catalog rows (cold-start and fallback lists)."""
+        rows = random.sample(range(len(catalog)), min(k, len(catalog)))
+        return cls(catalog, rows, np.full(len(rows), confidence), model_used)
+
+    @classmethod
+    def empty(cls, catalog, model_used):
+        return cls(catalog, np.empty(0, dtype=np.int64), np.empty(0), model_used)
+
+    def __len__(self):
+        return self.rows.shape[0]
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return RankedResults(self.catalog, self.rows[i], self.confidences[i], self.model_used)
+        return self._view(int(self.rows[i]), float(self.confidences[i]))
+
+    def __iter__(self):
+        records = self.catalog.records()
+        for row, confidence in zip(self.rows.tolist(), self.confidences.tolist()):
+            yield ProductView(records[row], confidence, self.model_used)
+
+    def _view(self, row, confidence):
+        return ProductView(self.catalog.row(row), confidence, self.model_used)
+
+    @property
+    def ids(self):
+        """Product ids, best first."""
+        return self.catalog.ids[self.rows].tolist()
+
+    def to_dicts(self, start_rank=1):
+        """Plain dicts with their 1-based rank (for JSON responses)."""
+        dicts = [view.to_dict() for view in self]
+        for rank, item in enumerate(dicts, start_rank):
+            item["rank"] = rank
+        return dicts
+
+    def excluding(self, product_ids):
+        """The list without the given products (ranking order kept)."""
+        exclude = np.fromiter((i for i in map(coerce_id, product_ids) if i is not None), dtype=np.int64)
+        keep = ~np.isin(self.catalog.ids[self.rows], exclude)
+        return RankedResults(self.catalog, self.rows[keep], self.confidences[keep], self.model_used)
+
+    def __repr__(self):
+        return f"RankedResults({len(self)} x {self.model_used!r})"
+
+
+# --- Cursor pagination ---
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(offset, version):
+    """Opaque page cursor: where the next page starts in a ranked list, and which ranking it was."""
+    raw = json.dumps({"o": int(offset), "v": version}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Returns (offset, version); raises InvalidCursor on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        offset = int(data["o"])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor) from None
+    if offset < 0:
+        raise InvalidCursor(cursor)
+    return offset, data.get("v")
@@ -0,0 +1,179 @@
+import json
+import threading
+import numpy as np
+
+DEFAULT_WEIGHTS = {
+    'price_weight': 0.3,
+    'relevance_weight': 0.7,
+    'novelty_weight': 0.1
+}
+
+# Learning Rate (How fast the AI adapts)
+ALPHA = 0.05
+
+# Column order of every weight array below
+WEIGHT_NAMES = ('relevance_weight', 'price_weight', 'novelty_weight')
+# Action -> +1 (positive), -1 (negative); anything else leaves the weights alone
+ACTION_SIGNS = {'like': 1, 'purchase': 1, 'dislike': -1}
+# Purchases above this price raise the user's tolerance for price
+EXPENSIVE_PRICE = 1000
+
+
+def weight_vector(weights):
+    """(relevance, price, novelty) array from a weights dict, JSON string or array (None -> defaults)."""
+    if isinstance(weights, np.ndarray):
+        return weights.astype(np.float64)
+    if isinstance(weights, str):
+        weights = json.loads(weights)
+    weights = weights or DEFAULT_WEIGHTS
+    return np.array([weights.get(name, DEFAULT_WEIGHTS[name]) for name in WEIGHT_NAMES], dtype=np.float64)
+
+
+def apply_actions(weights, rows, signs, prices):
+    """
+    One RL step for many users at once, in place: weights is users x 3 (WEIGHT_NAMES order),
+    rows the (distinct) rows that acted, signs their ACTION_SIGNS value, prices the product prices.
+    """
+    rel, price, nov = (weights[rows, i] for i in range(3))
+    positive, negative = signs > 0, signs < 0
+
+    # Logic:
+    # If 'like'/'purchase': Trust relevance more, trust price point.
+    # If 'dislike': Increase novelty (show different things), reduce relevance trust.
+    rel = np.where(positive, np.minimum(1.0, rel + ALPHA), rel)
+    nov = np.where(positive, np.maximum(0.0, nov - ALPHA), nov)
+    # If they buy expensive, increase tolerance for price
+    price = np.where(positive & (prices > EXPENSIVE_PRICE), np.maximum(0.1, price - ALPHA), price)
+    rel = np.where(negative, np.maximum(0.1, rel - ALPHA), rel)
+    nov = np.where(negative, np.minimum(0.5, nov + ALPHA), nov)
+
+    weights[rows, 0], weights[rows, 1], weights[rows, 2] = rel, price, nov
+
+
+def update_rl_weights(current_weights_json, action, product_price):
+    """
+    RL Algo : The Reinforcement Learning (RL) Feedback Loop.
+    Adjusts weights dynamically based on user actions.
+    """
+    # Parse JSON if needed
+    if isinstance(current_weights_json, str):
+        weights = json.loads(current_weights_json)
+    else:
+        weights = current_weights_json.copy()
+
+    vector = weight_vector(weights)[None, :]
+    apply_actions(vector, np.array([0]), np.array([ACTION_SIGNS.get(action, 0)]), np.array([product_price]))
+    for name, value in zip(WEIGHT_NAMES, vector[0].tolist()):
+        weights[name] = value
+    return json.dumps(weights)
+
+
+def weighted_scores(weights, relevance, price_score, novelty):
+    """
+    Re-ranking scores for one or many users in a single pass: weights is 3 or users x 3,
+    the features one value per candidate (relevance may also be users x candidates).
+    Each user's weights are normalized to sum to 1.
+    Returns candidates (one user) or users x candidates.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    totals = weights.sum(axis=-1, keepdims=True)
+    weights = weights / np.where(totals > 0, totals, 1.0)
+    return weights[..., 0:1] * relevance + weights[..., 1:2] * price_score + weights[..., 2:3] * novelty
+
+
+class RLWeightStore:
+    """
+    Per-process RL weights of every user seen so far: one users x 3 float64 array
+    (WEIGHT_NAMES columns) plus a user id -> row index.
+
+    The DB column (and the feedback queue's pending copy) stays the source of truth:
+    callers pass the stored JSON and the row is re-parsed only when that string changed,
+    so /feedback and the RL ranker skip the JSON round trip, and updates made by other
+    worker processes are still picked up. Writes go through the feedback queue, which
+    persists the latest weights per user in batches.
+    """
+
+    def __init__(self, capacity=1024):
+        self.weights = np.empty((capacity, 3), dtype=np.float64)
+        self._rows = {}
+        self._seen = []          # row -> stored JSON the row was last synced to
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _row(self, user_id):
+        row = self._rows.get(user_id)
+        if row is None:
+            row = len(self._rows)
+            if row == self.weights.shape[0]:
+                grown = np.empty((row * 2, 3), dtype=np.float64)
+                grown[:row] = self.weights
+                self.weights = grown
+            self._rows[user_id] = row
+            self._seen.append(None)
+        return row
+
+    def _sync(self, user_id, stored_json):
+        row = self._row(user_id)
+        if self._seen[row] is None or self._seen[row] != stored_json:
+            try:
+                self.weights[row] = weight_vector(stored_json)
+            except (ValueError, TypeError, AttributeError):
+                self.weights[row] = weight_vector(None)
+            self._seen[row] = stored_json
+        return row
+
+    def current(self, user_id, stored_json):
+        """The user's weights as a (relevance, price, novelty) array."""
+        with self._lock:
+            return self.weights[self._sync(user_id, stored_json)].copy()
+
+    def update(self, user_id, stored_json, action, product_price):
+        """Applies one feedback event; returns the new weights JSON (what update_rl_weights returns)."""
+        with self._lock:
+            row = self._sync(user_id, stored_json)
+            apply_actions(self.weights, np.array([row]), np.array([ACTION_SIGNS.get(action, 0)]),
+                          np.array([product_price], dtype=np.float64))
+            new_json = self.to_json(row)
+            self._seen[row] = new_json
+            return new_json
+
+    def to_json(self, row):
+        return json.dumps(dict(zip(WEIGHT_NAMES, self.weights[row].tolist())))
+
+    def replay(self, user_ids, actions, prices):
+        """
+        Rebuilds weights from an interaction log, starting every listed user from
+        DEFAULT_WEIGHTS. Events must be sorted by user, then time. One vectorized step per
+        event position: step k applies every user's k-th event at once, so the cost grows
+        with the longest history rather than the number of events.
+        Returns {user_id: weights JSON} for the users in the log.
+        """
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        if not user_ids.size:
+            return {}
+        signs = np.array([ACTION_SIGNS.get(a, 0) for a in actions], dtype=np.int8)
+        prices = np.asarray(prices, dtype=np.float64)
+
+        # Position of each event within its user's history
+        starts = np.flatnonzero(np.r_[True, user_ids[1:] != user_ids[:-1]])
+        users = user_ids[starts]
+        lengths = np.diff(np.r_[starts, user_ids.size])
+        user_rows = np.repeat(np.arange(users.size), lengths)
+        positions = np.arange(user_ids.size) - np.repeat(starts, lengths)
+
+        weights = np.tile(weight_vector(None), (users.size, 1))
+        order = np.argsort(positions, kind="stable")
+        bounds = np.r_[0, np.cumsum(np.bincount(positions))]
+        for k in range(bounds.size - 1):
+            step = order[bounds[k]:bounds[k + 1]]
+            apply_actions(weights, user_rows[step], signs[step], prices[step])
+
+        with self._lock:
+            rebuilt = {}
+            for user_id, vector in zip(users.tolist(), weights):
+                row = self._row(user_id)
+                self.weights[row] = vector
+                rebuilt[user_id] = self._seen[row] = self.to_json(row)
+            return rebuilt
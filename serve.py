@@ -0,0 +1,75 @@
+"""
+Production server: gunicorn, configured by this file.
+
+    gunicorn -c serve.py app:app
+    OPTGIFT_WORKERS=4 OPTGIFT_BIND=0.0.0.0:8000 gunicorn -c serve.py app:app
+
+The app is preloaded: the gunicorn master imports it and loads the catalog, embedding
+matrix and vector index once (when_ready), then forks the workers. Workers share that data
+read-only: the embeddings are an mmap of the embedding store (one copy in the page cache)
+and everything else is inherited copy-on-write. Each worker gets fresh DB connections, its
+background threads and the sentence encoder after fork (post_fork).
+
+Limitation: only the data loaded at startup is shared. A hot catalog reload
+(POST /admin/reload_catalog or the CSV watcher) happens in every worker on its own: each
+re-syncs the embeddings and rebuilds a private index, and for as long as that takes the
+workers may serve different catalog versions. Restart gunicorn to share the new catalog
+again (a plain HUP does not re-run the preload).
+
+`python app.py` is still the single-process development server.
+"""
+import os
+import gc
+import time
+
+# Must be set before app is imported: no warm-up or background threads in the master
+STARTUP_MODE = os.environ.get("OPTGIFT_STARTUP_MODE", "background")
+os.environ["OPTGIFT_STARTUP_MODE"] = "lazy"
+os.environ["OPTGIFT_PREFORK"] = "1"
+
+# --- gunicorn settings ---
+bind = os.environ.get("OPTGIFT_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("OPTGIFT_WORKERS", os.cpu_count() or 2))
+worker_class = "gthread"
+threads = int(os.environ.get("OPTGIFT_THREADS", "4"))
+preload_app = True
+# Model loading in a worker must not trip the heartbeat
+timeout = int(os.environ.get("OPTGIFT_WORKER_TIMEOUT", "120"))
+
+
+def app_after_fork(startup_mode):
+    """Per-worker setup: fresh DB connections, background threads, then the model."""
+    import app as app_module
+    with app_module.app.app_context():
+        # Never reuse the master's pooled connections in a child
+        app_module.db.engine.dispose(close=False)
+    app_module.start_background_workers()
+    if startup_mode == "eager":
+        app_module.engine.get()
+    elif startup_mode == "background":
+        app_module.engine.warm_in_background()
+
+
+# --- gunicorn hooks ---
+def when_ready(server):
+    # Runs in the master after the preload, before any worker is forked
+    from models import CATALOG
+    from recommender import preload_shared_data
+
+    start = time.perf_counter()
+    preload_shared_data(CATALOG)
+    server.log.info(f"Catalog, embeddings and index preloaded in {time.perf_counter() - start:.2f}s")
+    # Move everything loaded so far out of the GC's reach, so collections in the
+    # workers do not touch (and copy) the inherited pages
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    app_after_fork(STARTUP_MODE)
+
+
+def worker_exit(server, worker):
+    # Final feedback flush (journal cleanup) on graceful worker shutdown
+    import app as app_module
+    app_module.feedback_queue.close()
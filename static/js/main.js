@@ -37,11 +37,156 @@ function likeProduct(productId) {
     });
 }
 
+// --- Replacement Queues ---
+// Each dashboard list is one ranked list on the server; the cards after the visible ones are
+// prefetched from /api/recommendations so a dislike is replaced instantly, without a round trip.
+const QUEUE_LOW_WATER = 3;
+const replacementQueues = new Map();
+
+function escapeHtml(value) {
+    return String(value ?? '').replace(/[&<>"']/g, ch => ({
+        '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+    }[ch]));
+}
+
+function getQueue(grid) {
+    if (!replacementQueues.has(grid)) {
+        replacementQueues.set(grid, { items: [], cursor: grid.dataset.cursor || null, loading: null });
+    }
+    return replacementQueues.get(grid);
+}
+
+function visibleProductIds() {
+    return new Set(Array.from(document.querySelectorAll('.card')).map(c => String(c.getAttribute('data-id'))));
+}
+
+function prefetchQueue(grid) {
+    const queue = getQueue(grid);
+    if (queue.loading || !queue.cursor || queue.items.length >= QUEUE_LOW_WATER) {
+        return queue.loading || Promise.resolve();
+    }
+    const params = new URLSearchParams({
+        mode: grid.dataset.mode,
+        query: grid.dataset.query || '',
+        occasion: grid.dataset.occasion || '',
+        relationship: grid.dataset.relationship || '',
+        cursor: queue.cursor
+    });
+    queue.loading = fetch(`/api/recommendations?${params}`)
+        .then(res => res.json())
+        .then(data => {
+            if (data.status === 'success') {
+                queue.items.push(...data.items);
+                queue.cursor = data.next_cursor;
+            } else {
+                queue.cursor = null;
+            }
+        })
+        .catch(err => console.error("Prefetch failed:", err))
+        .finally(() => { queue.loading = null; });
+    return queue.loading;
+}
+
+function nextFromQueue(grid) {
+    const queue = getQueue(grid);
+    const visible = visibleProductIds();
+    while (queue.items.length) {
+        const prod = queue.items.shift();
+        if (!visible.has(String(prod.id))) return prod;
+    }
+    return null;
+}
+
+// Client-side twin of templates/product_card.html
+function renderCard(prod) {
+    const id = escapeHtml(prod.id);
+    const tags = prod.tags || [];
+    const rating = parseFloat(prod.rating) || 0;
+    let stars = '';
+    for (let i = 0; i < 5; i++) {
+        stars += rating > i ? '<i class="fas fa-star"></i>' : '<i class="far fa-star"></i>';
+    }
+    const tagHtml = tags.slice(0, 3).map(tag => `
+                <span style="background: #f1f2f6; color: #57606f; font-size: 0.7rem; padding: 2px 8px; border-radius: 10px; border: 1px solid #dfe4ea;">
+                    ${escapeHtml(tag)}
+                </span>`).join('');
+    const match = prod.confidence ? `
+        <div style="margin-bottom: 8px; font-size: 0.8rem; background: #e8f5e9; color: #2e7d32; padding: 4px 8px; border-radius: 4px; display: inline-block;">
+            <strong>${escapeHtml(prod.confidence)}% Match</strong>
+            <div style="font-size: 0.7rem; color: #555;">via ${escapeHtml(prod.model_used)}</div>
+        </div>` : '';
+    const cartButton = prod.in_cart
+        ? `<button onclick="toggleCart('${id}', this)" class="btn-primary btn-sm cart-btn remove-mode" title="Remove from Cart">
+                    Cart <span class="sign">-</span>
+                </button>`
+        : `<button onclick="toggleCart('${id}', this)" class="btn-primary btn-sm cart-btn" title="Add to Cart">
+                    Cart <span class="sign">+</span>
+                </button>`;
+
+    return `
+<div class="card" id="card-${id}" 
+     data-id="${id}" 
+     data-title="${escapeHtml(prod.title)}" 
+     data-price="${escapeHtml(prod.price)}" 
+     data-vendor="${escapeHtml(prod.vendor)}" 
+     data-img="${escapeHtml(prod.image_url)}"
+     data-confidence="${prod.confidence ? escapeHtml(prod.confidence) : 'N/A'}"
+     data-tags="${escapeHtml(tags.join(', '))}">
+    <div class="card-img">
+        <img src="${escapeHtml(prod.image_url)}" 
+             alt="${escapeHtml(prod.title)}" 
+             style="width: 100%; height: 200px; object-fit: cover; border-top-left-radius: 8px; border-top-right-radius: 8px;"
+             onerror="this.onerror=null;this.src='https://via.placeholder.com/150';">
+    </div>
+    <div class="card-body">
+        <h4 style="font-size: 1rem; margin: 10px 0 5px 0;">${escapeHtml(prod.title)}</h4>
+        <div class="rating-row" style="color: #f39c12; font-size: 0.85rem; margin-bottom: 8px;">
+            <span class="stars">${stars}</span>
+            <span style="color: #666; margin-left: 4px;">(${rating})</span>
+        </div>
+        <div class="tags-row" style="margin-bottom: 10px; display: flex; flex-wrap: wrap; gap: 4px;">${tagHtml}
+        </div>${match}
+        <p class="price" style="font-weight: bold; margin-bottom: 12px;">
+            ₹${escapeHtml(prod.price)} <span class="vendor" style="font-weight: normal; font-size: 0.8rem; color: #888;">via ${escapeHtml(prod.vendor)}</span>
+        </p>
+        <div class="actions-row">
+            <div class="action-group">
+                <button onclick="likeProduct('${id}')" class="btn-icon btn-like" title="Like">👍</button>
+                <button onclick="dislikeProduct('${id}')" class="btn-icon btn-dislike" title="Dislike">👎</button>
+            </div>
+            <div class="action-group">
+                <button onclick="toggleCompare('${id}', this)" class="btn-secondary btn-sm compare-btn" title="Compare">
+                    Comp <span class="sign">+</span>
+                </button>
+                ${cartButton}
+            </div>
+        </div>
+    </div>
+</div>`;
+}
+
+// Fallback when a list has no queue (or it ran dry): one server-rendered card
+function fetchReplacementCard(grid, excludeIds) {
+    const body = { exclude_ids: excludeIds };
+    if (grid && grid.dataset.mode) {
+        Object.assign(body, {
+            mode: grid.dataset.mode, query: grid.dataset.query,
+            occasion: grid.dataset.occasion, relationship: grid.dataset.relationship
+        });
+    }
+    return fetch('/get_replacement_card', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify(body)
+    }).then(res => res.json());
+}
+
 // --- Dislike & Replace Logic ---
 function dislikeProduct(productId) {
     const card = document.getElementById(`card-${productId}`);
     const visibleCards = document.querySelectorAll('.card');
     let excludeIds = Array.from(visibleCards).map(c => parseInt(c.getAttribute('data-id')));
+    const grid = card ? card.closest('.scroll-grid[data-mode]') : null;
     if(card) card.style.opacity = '0';
     showToast("Product removed. Fetching new recommendation...", "info");
     
@@ -50,13 +195,15 @@ function dislikeProduct(productId) {
             const parent = card.parentNode;
             card.remove(); // Remove old card
 
-            // 3. Fetch Replacement
-            fetch('/get_replacement_card', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({ exclude_ids: excludeIds })
-            })
-            .then(res => res.json())
+            // 3. Next card of the same ranked list, from the prefetched queue
+            const queued = grid ? nextFromQueue(grid) : null;
+            if (queued) {
+                parent.insertAdjacentHTML('beforeend', renderCard(queued));
+                showToast("New suggestion added!", "success");
+                prefetchQueue(grid);
+                return;
+            }
+            fetchReplacementCard(grid, excludeIds)
             .then(data => {
                 if(data.status === 'success') {
                     // Insert new HTML
@@ -298,6 +445,9 @@ function closeCompareModal() {
 
 // --- Event Listeners ---
 document.addEventListener('DOMContentLoaded', function() {
+    // Fill each list's replacement queue in the background
+    document.querySelectorAll('.scroll-grid[data-mode]').forEach(grid => prefetchQueue(grid));
+
     window.onclick = function(event) {
         const modal = document.getElementById('compareModal');
         if (event.target == modal) {
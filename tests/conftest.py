@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# models.py loads the catalog at import time; point it at the repo's CSV from any cwd
+os.environ.setdefault("OPTGIFT_CATALOG_CSV", os.path.join(ROOT, "optgiftai_database.csv"))
+
+from catalog import Catalog  # noqa: E402
+
+
+def product(pid, title="Gift", price=100.0, tags=None, **fields):
+    return {"id": pid, "title": title, "rating": 4.0, "tags": tags or ["gift"], "price": price,
+            "description": "", "image_url": "", "vendor": "Shop", "link": "#", **fields}
+
+
+@pytest.fixture
+def make_catalog():
+    def make(*products):
+        return Catalog.from_records(list(products))
+    return make
+
+
+@pytest.fixture
+def db_app():
+    """A bare Flask app on an in-memory SQLite database with every table created."""
+    from flask import Flask
+    from models import db
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def user(db_app):
+    from models import db, User
+
+    u = User(phone="555", name="Test")
+    db.session.add(u)
+    db.session.commit()
+    return u
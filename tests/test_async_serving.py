@@ -0,0 +1,47 @@
+import time
+
+import metrics
+from async_serving import RecommendationExecutor
+
+
+def test_stage_timings_from_pool_threads_reach_the_request_trace():
+    executor = RecommendationExecutor(max_workers=2)
+
+    def job(name):
+        def run():
+            with metrics._TimedStage(name):
+                time.sleep(0.01)
+            return name
+        return run
+
+    metrics.begin_trace()
+    try:
+        results = executor.gather({"retrieval": job("recommend_content"), "collab": job("recommend_collab")},
+                                  {"retrieval": 5.0, "collab": 5.0}, fallback=lambda name, reason: None)
+    finally:
+        stages = metrics.end_trace()
+
+    assert {name: r.value for name, r in results.items()} == {"retrieval": "recommend_content",
+                                                              "collab": "recommend_collab"}
+    assert sorted(name for name, _ in stages) == ["recommend_collab", "recommend_content"]
+
+
+def test_pool_threads_do_not_keep_a_finished_requests_trace():
+    executor = RecommendationExecutor(max_workers=1)
+    metrics.begin_trace()
+    executor.submit(lambda: None).result()
+    metrics.end_trace()
+
+    assert executor.submit(lambda: getattr(metrics._trace, "stages", None)).result() is None
+
+
+def test_degraded_stage_uses_the_fallback():
+    executor = RecommendationExecutor(max_workers=1)
+
+    def boom():
+        raise RuntimeError("model down")
+
+    results = executor.gather({"collab": boom, "retrieval": None}, {}, fallback=lambda name, reason: reason)
+
+    assert (results["collab"].value, results["collab"].degraded) == ("error", True)
+    assert results["retrieval"].value == "unavailable"
@@ -0,0 +1,62 @@
+import pytest
+
+import cart_store
+from conftest import product
+from models import Order, OrderLine
+
+
+def test_add_to_cart_counts_a_product_once(user, make_catalog):
+    catalog = make_catalog(product(1), product(2))
+
+    assert cart_store.add_to_cart(user, 1, catalog) is True
+    assert cart_store.add_to_cart(user, "1", catalog) is False
+    assert cart_store.add_to_cart(user, 2, catalog) is True
+
+    assert cart_store.cart_product_ids(user.id) == [1, 2]
+    assert user.cart_count == 2
+
+
+@pytest.mark.parametrize("bad_id", [None, "", "abc", 999])
+def test_add_to_cart_rejects_ids_the_catalog_does_not_have(user, make_catalog, bad_id):
+    catalog = make_catalog(product(1))
+
+    with pytest.raises(cart_store.InvalidProduct):
+        cart_store.add_to_cart(user, bad_id, catalog)
+    assert cart_store.cart_product_ids(user.id) == []
+    assert user.cart_count == 0
+
+
+def test_place_order_copies_lines_and_empties_the_cart(user, make_catalog):
+    catalog = make_catalog(product(1, "Mug", 150.0), product(2, "Lamp", 900.0))
+    cart_store.add_to_cart(user, 1, catalog)
+    cart_store.add_to_cart(user, 2, catalog)
+
+    order, unavailable = cart_store.place_order(user, catalog)
+
+    assert unavailable == []
+    assert order.total == 1050.0
+    assert sorted(line.title for line in OrderLine.query.filter_by(order_id=order.id)) == ["Lamp", "Mug"]
+    assert cart_store.cart_product_ids(user.id) == []
+    assert user.cart_count == 0
+
+
+def test_place_order_reports_products_gone_after_a_reload(user, make_catalog):
+    cart_store.add_to_cart(user, 1, make_catalog(product(1), product(2)))
+    cart_store.add_to_cart(user, 2, make_catalog(product(1), product(2)))
+    reloaded = make_catalog(product(1, "Mug", 150.0))
+
+    order, unavailable = cart_store.place_order(user, reloaded)
+
+    assert unavailable == [2]
+    assert [line.product_id for line in OrderLine.query.filter_by(order_id=order.id)] == [1]
+    assert user.cart_count == 0
+
+
+def test_place_order_with_only_vanished_products_orders_nothing(user, make_catalog):
+    cart_store.add_to_cart(user, 2, make_catalog(product(2)))
+
+    order, unavailable = cart_store.place_order(user, make_catalog(product(1)))
+
+    assert order is None and unavailable == [2]
+    assert Order.query.count() == 0
+    assert cart_store.cart_product_ids(user.id) == [] and user.cart_count == 0
@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+from catalog import COLUMNS, CatalogManager, diff_catalogs
+from conftest import product
+
+
+def test_diff_catalogs_counts_each_kind_of_change(make_catalog):
+    old = make_catalog(product(1, "Mug"), product(2, "Lamp", 500.0), product(3, "Book"), product(4, "Pen"))
+    new = make_catalog(
+        product(1, "Mug"),                  # unchanged
+        product(2, "Lamp", 450.0),          # price only: no re-embedding
+        product(3, "Signed Book"),          # text: needs a new embedding
+        product(5, "Scarf"), product(6, "Hat"),
+    )
+
+    diff = diff_catalogs(old, new)
+
+    assert (diff["added"], diff["removed"], diff["text_changed"], diff["fields_changed"]) == (2, 1, 1, 1)
+    assert diff["rows"] == 5
+    assert diff["old_version"] == old.version and diff["new_version"] == new.version != old.version
+
+
+def test_diff_catalogs_ignores_repeated_ids(make_catalog):
+    old = make_catalog(product(1, "Mug"))
+    new = make_catalog(product(1, "Mug"), product(1, "Duplicate row"))
+
+    diff = diff_catalogs(old, new)
+
+    assert (diff["added"], diff["removed"], diff["text_changed"], diff["fields_changed"]) == (0, 0, 0, 0)
+
+
+def write_csv(path, *products):
+    rows = [{**p, "tags": ", ".join(p["tags"])} for p in products]
+    pd.DataFrame(rows, columns=COLUMNS).to_csv(path, index=False)
+    return str(path)
+
+
+def test_reload_publishes_only_after_every_listener_prepared(tmp_path, make_catalog):
+    csv = write_csv(tmp_path / "catalog.csv", product(1, "Mug"), product(2, "Lamp"))
+    manager = CatalogManager(make_catalog(product(1, "Mug")), csv)
+    old = manager.current
+    seen = []
+
+    @manager.on_reload
+    def listener(new, diff):
+        seen.append(("prepare", manager.current is old))
+        return lambda: seen.append(("publish", manager.current is new))
+
+    diff = manager.reload()
+
+    assert diff["added"] == 1
+    assert seen == [("prepare", True), ("publish", True)]
+    assert manager.reload() is None  # same file again: nothing to do
+
+
+def test_failed_listener_keeps_the_live_catalog(tmp_path, make_catalog):
+    csv = write_csv(tmp_path / "catalog.csv", product(1, "Mug"), product(2, "Lamp"))
+    manager = CatalogManager(make_catalog(product(1, "Mug")), csv)
+    old = manager.current
+
+    @manager.on_reload
+    def listener(new, diff):
+        raise RuntimeError("index build failed")
+
+    with pytest.raises(RuntimeError):
+        manager.reload()
+    assert manager.current is old
@@ -0,0 +1,54 @@
+import numpy as np
+
+from cf_model import CollaborativeModel, action_score
+
+
+def trained_model():
+    rng = np.random.default_rng(0)
+    actions = rng.choice(["view", "like", "purchase"], 600)
+    model = CollaborativeModel(n_components=8, retrain_after=10 ** 9)
+    model.fit_arrays(rng.integers(0, 30, 600).tolist(), rng.integers(0, 50, 600).astype(str).tolist(),
+                     [action_score(a) for a in actions])
+    return model
+
+
+def projected_row(snap, row, fold_ins):
+    """What a retrain would project: the trained row with each fold-in max-merged in."""
+    ratings = snap.ratings[row].toarray().ravel()
+    for col, score in fold_ins.items():
+        ratings[col] = max(ratings[col], score)
+    return ratings @ snap.item_factors.T
+
+
+def test_fold_in_of_known_pairs_is_not_counted_twice():
+    model = trained_model()
+    snap = model.snapshot
+    row = snap.user_index[3]
+    known = snap.ratings[row].indices[:3]
+    unseen = next(c for c in range(len(snap.product_ids)) if snap.ratings[row, c] == 0)
+
+    for col in known:
+        model.record(3, snap.product_ids[col], "like")
+    model.record(3, snap.product_ids[unseen], "purchase")
+
+    np.testing.assert_allclose(model._folded_vector(snap, 3), projected_row(snap, row, model._fold_ins[3]),
+                               atol=1e-4)
+
+
+def test_repeating_a_known_rating_leaves_the_vector_alone():
+    model = trained_model()
+    snap = model.snapshot
+    row = snap.user_index[3]
+    col = snap.ratings[row].indices[0]
+
+    model.record(3, snap.product_ids[col], "view")  # scores 1, never above what training saw
+
+    np.testing.assert_allclose(model._folded_vector(snap, 3), snap.user_factors[row], atol=1e-5)
+
+
+def test_new_user_fold_in_projects_their_ratings():
+    model = trained_model()
+    snap = model.snapshot
+    model.record(999, snap.product_ids[0], "purchase")
+
+    np.testing.assert_allclose(model._folded_vector(snap, 999), 5 * snap.item_factors[:, 0], rtol=1e-6)
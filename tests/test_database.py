@@ -0,0 +1,64 @@
+from sqlalchemy import update
+
+from database import UserCache
+from models import db, User
+
+
+def test_hit_serves_the_cached_row_without_a_select(user):
+    user_id = user.id
+    cache = UserCache(User, db.session)
+    cache.load(user_id)
+    db.session.execute(update(User).where(User.id == user_id).values(name="Renamed"))
+    db.session.commit()
+    db.session.expunge_all()
+
+    assert cache.load(user_id).name == "Test"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_invalidate_forces_a_reload(user):
+    user_id = user.id
+    cache = UserCache(User, db.session)
+    cache.load(user_id)
+    db.session.execute(update(User).where(User.id == user_id).values(name="Renamed"))
+    db.session.commit()
+    db.session.expunge_all()
+
+    cache.invalidate(user_id)
+
+    assert cache.load(user_id).name == "Renamed"
+    assert cache.misses == 2
+
+
+def test_invalidation_during_a_load_keeps_the_old_row_out(user):
+    user_id = user.id
+    cache = UserCache(User, db.session)
+    real_get = db.session.get
+
+    def get_then_invalidate(model, pk):
+        row = real_get(model, pk)
+        cache.invalidate(pk)  # a writer commits while this read is in flight
+        return row
+
+    db.session.get = get_then_invalidate
+    try:
+        cache.load(user_id)
+    finally:
+        del db.session.get
+
+    assert cache.stats()["size"] == 0
+
+
+def test_excluded_columns_are_read_fresh_on_a_hit(user):
+    user_id = user.id
+    cache = UserCache(User, db.session, exclude=("rl_weights",))
+    cache.load(user_id)
+    db.session.execute(update(User).where(User.id == user_id).values(rl_weights='{"relevance": 2.0}', name="Renamed"))
+    db.session.commit()
+    db.session.expunge_all()
+
+    cached = cache.load(user_id)
+
+    assert cache.hits == 1
+    assert cached.name == "Test"
+    assert cached.rl_weights == '{"relevance": 2.0}'
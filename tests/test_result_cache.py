@@ -0,0 +1,52 @@
+from result_cache import RecommendationCache
+
+
+def key(user_id, mode="collab", query=""):
+    return RecommendationCache.make_key(user_id, mode, query, "", "", 10, "v1", 1)
+
+
+def test_invalidate_user_drops_only_that_users_entries():
+    cache = RecommendationCache()
+    cache.put(key(1), ["a"])
+    cache.put(key(1, "rl"), ["b"])
+    cache.put(key(2), ["c"])
+    cache.put(key(None, "content", "mug"), ["shared"])
+
+    cache.invalidate_user(1)
+
+    assert cache.get(key(1)) is None and cache.get(key(1, "rl")) is None
+    assert cache.get(key(2)) == ["c"]
+    assert cache.get(key(None, "content", "mug")) == ["shared"]
+    assert 1 not in cache._by_user and cache._by_user[2] == {key(2)}
+    assert None not in cache._by_user
+
+
+def test_eviction_and_expiry_keep_the_user_index_in_step():
+    cache = RecommendationCache(maxsize=2)
+    cache.put(key(1), ["a"])
+    cache.put(key(2), ["b"])
+    cache.put(key(3), ["c"])  # evicts user 1's only entry
+
+    assert set(cache._by_user) == {2, 3}
+
+    cache.ttl = 0
+    assert cache.get(key(2)) is None
+    assert set(cache._by_user) == {3}
+
+
+def test_query_is_normalized_into_the_key():
+    cache = RecommendationCache()
+    cache.put(key(None, "content", "Coffee  Mug"), ["x"])
+
+    assert cache.get(key(None, "content", "coffee mug")) == ["x"]
+
+
+def test_clear_empties_everything():
+    cache = RecommendationCache()
+    cache.put(key(1), ["a"])
+    cache.put(key(None, "content"), ["b"])
+
+    cache.clear()
+
+    assert cache.get(key(1)) is None and cache.get(key(None, "content")) is None
+    assert cache._by_user == {}
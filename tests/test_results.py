@@ -0,0 +1,42 @@
+import base64
+
+import pytest
+
+from conftest import product
+from results import InvalidCursor, RankedResults, decode_cursor, encode_cursor
+
+
+@pytest.mark.parametrize("offset, version", [(0, None), (10, "a1b2c3:4"), (12345, "v")])
+def test_cursor_round_trip(offset, version):
+    cursor = encode_cursor(offset, version)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (offset, version)
+
+
+@pytest.mark.parametrize("cursor", [
+    "", "not a cursor!", "e30",  # e30 is '{}': no offset
+    base64.urlsafe_b64encode(b'{"o":"x"}').decode(),
+    encode_cursor(-1, "v"),
+])
+def test_decode_cursor_rejects_malformed_cursors(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_pages_from_cursors_cover_the_list_once(make_catalog):
+    catalog = make_catalog(*(product(pid) for pid in range(1, 8)))
+    ranked = RankedResults(catalog, [6, 5, 4, 3, 2, 1, 0], [90, 80, 70, 60, 50, 40, 30], "content")
+    seen, cursor = [], None
+    while True:
+        offset, _ = decode_cursor(cursor) if cursor else (0, None)
+        page = ranked[offset:offset + 3]
+        seen.extend(item["rank"] for item in page.to_dicts(start_rank=offset + 1))
+        seen_ids = page.ids
+        end = offset + len(page)
+        cursor = encode_cursor(end, "v") if end < len(ranked) else None
+        if cursor is None:
+            break
+
+    assert seen == list(range(1, 8))
+    assert seen_ids == [1]
@@ -0,0 +1,84 @@
+import json
+import random
+
+import numpy as np
+import pytest
+
+from rl_weights import DEFAULT_WEIGHTS, RLWeightStore, update_rl_weights, weighted_scores
+
+ACTIONS = ["like", "purchase", "dislike", "view", "add_to_cart"]
+
+
+def reference_update(weights, action, product_price, alpha=0.05):
+    """The original dict-based rule, kept here as the spec the NumPy versions must match."""
+    weights = dict(weights)
+    if action in ['like', 'purchase']:
+        weights['relevance_weight'] = min(1.0, weights['relevance_weight'] + alpha)
+        weights['novelty_weight'] = max(0.0, weights['novelty_weight'] - alpha)
+        if product_price > 1000:
+            weights['price_weight'] = max(0.1, weights['price_weight'] - alpha)
+    elif action == 'dislike':
+        weights['relevance_weight'] = max(0.1, weights['relevance_weight'] - alpha)
+        weights['novelty_weight'] = min(0.5, weights['novelty_weight'] + alpha)
+    return weights
+
+
+def random_log(seed, users=40, events=1500):
+    rng = random.Random(seed)
+    log = [(rng.randrange(users), rng.choice(ACTIONS), rng.choice([50.0, 999.0, 1000.0, 1001.0, 4000.0]))
+           for _ in range(events)]
+    # replay() wants events sorted by user, then time; sorted() is stable, so list order is time
+    return sorted(log, key=lambda event: event[0])
+
+
+def assert_weights_equal(actual_json, expected):
+    actual = json.loads(actual_json)
+    assert actual.keys() == expected.keys()
+    for name in expected:
+        assert actual[name] == pytest.approx(expected[name], abs=1e-12)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_replay_matches_the_scalar_rule(seed):
+    log = random_log(seed)
+    expected = {}
+    for user_id, action, price in log:
+        expected[user_id] = reference_update(expected.get(user_id, DEFAULT_WEIGHTS), action, price)
+
+    rebuilt = RLWeightStore(capacity=4).replay(*zip(*log))
+
+    assert rebuilt.keys() == expected.keys()
+    for user_id, weights in expected.items():
+        assert_weights_equal(rebuilt[user_id], weights)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_update_rl_weights_and_store_update_match_the_scalar_rule(seed):
+    log = random_log(seed, users=5, events=300)
+    store = RLWeightStore(capacity=2)
+    stored, expected = {}, {}
+    for user_id, action, price in log:
+        expected[user_id] = reference_update(expected.get(user_id, DEFAULT_WEIGHTS), action, price)
+        previous = stored.get(user_id, json.dumps(DEFAULT_WEIGHTS))
+        stored[user_id] = store.update(user_id, previous, action, price)
+        assert_weights_equal(update_rl_weights(previous, action, price), expected[user_id])
+        assert_weights_equal(stored[user_id], expected[user_id])
+
+
+def test_store_picks_up_weights_written_elsewhere():
+    store = RLWeightStore()
+    store.update(1, json.dumps(DEFAULT_WEIGHTS), "like", 10.0)
+    newer = json.dumps({"relevance_weight": 0.2, "price_weight": 0.5, "novelty_weight": 0.3})
+
+    assert store.current(1, newer).tolist() == [0.2, 0.5, 0.3]
+
+
+def test_weighted_scores_for_many_users_matches_one_at_a_time():
+    rng = np.random.default_rng(0)
+    weights = rng.random((4, 3))
+    relevance, price_score, novelty = rng.random((4, 6)), rng.random(6), rng.random(6)
+
+    together = weighted_scores(weights, relevance, price_score, novelty)
+
+    for u in range(4):
+        np.testing.assert_allclose(together[u], weighted_scores(weights[u], relevance[u], price_score, novelty))
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from vector_index import BruteForceIndex, IVFIndex, load_index, save_index
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(1).standard_normal((600, 16)).astype(np.float32)
+
+
+def test_probing_every_cell_is_exact(vectors):
+    ivf = IVFIndex(nlist=20, nprobe=20).build(vectors)
+    flat = BruteForceIndex().build(vectors)
+
+    for q in vectors[:20]:
+        assert ivf.search(q, 10)[0].tolist() == flat.search(q, 10)[0].tolist()
+
+
+def test_rows_stay_sorted_by_cell_through_add_and_remove(vectors):
+    ivf = IVFIndex(nlist=20).build(vectors)
+    ivf.add(-vectors[:5], np.arange(5))
+    ivf.remove([7, 8])
+
+    cells = np.argmax(ivf.vectors @ ivf.centroids.T, axis=1)
+    assert len(ivf) == 598 and ivf.offsets[-1] == 598
+    assert (np.diff(cells) >= 0).all()
+    assert ivf.search(-vectors[0], 1)[0].tolist() == [0]
+    assert not np.isin([7, 8], ivf.ids).any()
+
+
+def test_too_few_probed_candidates_widen_to_every_row(vectors):
+    ivf = IVFIndex(nlist=20, nprobe=1).build(vectors)
+
+    ids, _ = ivf.search(vectors[0], 100)
+
+    assert ids.tolist() == BruteForceIndex().build(vectors).search(vectors[0], 100)[0].tolist()
+
+
+def test_saved_index_searches_the_same(vectors, tmp_path):
+    ivf = IVFIndex(nlist=20, dtype="int8").build(vectors)
+    path = str(tmp_path / "index.npz")
+    save_index(ivf, path, "fp")
+
+    loaded = load_index(path, "fp")
+
+    assert loaded.offsets.tolist() == ivf.offsets.tolist()
+    assert loaded.search(vectors[3], 5)[0].tolist() == ivf.search(vectors[3], 5)[0].tolist()
+    assert load_index(path, "other") is None
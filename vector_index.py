@@ -0,0 +1,365 @@
+import os
+import time
+import hashlib
+import argparse
+import numpy as np
+from embedding_store import to_storage, from_storage
+
+# Rows dequantized per step when scoring float16/int8 vectors (bounds the float32 scratch space)
+SCORE_BLOCK = 16384
+
+
+def normalize(vectors):
+    """L2-normalizes rows as float32 so a dot product equals cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(scores, k):
+    """Indices of the k highest scores, best first, using argpartition (O(N + k log k))."""
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= n:
+        return np.argsort(-scores, kind="stable")
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def score_rows(vectors, q):
+    """Dot products of stored rows with a float32 query; low-precision rows are upcast in blocks."""
+    if vectors.dtype == np.float32:
+        return vectors @ q
+    scores = np.empty(vectors.shape[0], dtype=np.float32)
+    for start in range(0, vectors.shape[0], SCORE_BLOCK):
+        scores[start:start + SCORE_BLOCK] = from_storage(vectors[start:start + SCORE_BLOCK]) @ q
+    return scores
+
+
+def fingerprint(vectors):
+    """Cheap identity of an embedding matrix, used to detect stale persisted indexes."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    return hashlib.sha1(vectors.tobytes()).hexdigest()
+
+
+# --- Exact index ---
+class BruteForceIndex:
+    """Exact search: normalized dot products + argpartition. Rows are kept in `dtype`."""
+    kind = "flat"
+
+    def __init__(self, dim=None, dtype="float32"):
+        self.dim = dim
+        self.dtype = dtype
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vectors = np.empty((0, dim or 0), dtype=dtype)
+
+    def __len__(self):
+        return self.ids.shape[0]
+
+    def build(self, vectors, ids=None):
+        vectors = to_storage(normalize(vectors), self.dtype)
+        self.dim = vectors.shape[1]
+        self.ids = np.arange(len(vectors), dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64)
+        self.vectors = vectors
+        return self
+
+    def add(self, vectors, ids):
+        vectors = to_storage(normalize(vectors), self.dtype)
+        ids = np.asarray(ids, dtype=np.int64)
+        # Re-adding an id replaces its vector
+        self.remove(ids)
+        self.ids = np.concatenate([self.ids, ids])
+        self.vectors = np.vstack([self.vectors.reshape(-1, vectors.shape[1]), vectors])
+        self.dim = vectors.shape[1]
+
+    def remove(self, ids):
+        keep = ~np.isin(self.ids, ids)
+        self.ids = self.ids[keep]
+        self.vectors = self.vectors[keep]
+
+    def search(self, query, k):
+        """Returns (ids, scores) of the k nearest rows, best first."""
+        q = normalize(query)[0]
+        scores = score_rows(self.vectors, q)
+        best = top_k(scores, k)
+        return self.ids[best], scores[best]
+
+    def state(self):
+        return {"ids": self.ids, "vectors": self.vectors}
+
+    def load_state(self, state):
+        self.ids = state["ids"]
+        self.vectors = state["vectors"]
+        self.dim = self.vectors.shape[1]
+        self.dtype = str(self.vectors.dtype)
+
+
+# --- Approximate index ---
+class IVFIndex:
+    """
+    Inverted-file index: spherical k-means partitions the vectors into `nlist` cells and a
+    query only scans the `nprobe` cells whose centroids are closest to it.
+
+    Rows live in one contiguous matrix sorted by cell (the layout save_index writes), with
+    cell c at rows offsets[c]:offsets[c + 1], so a probe scores views of it and the
+    every-cell fallback scores the matrix as is, without copying vectors per query.
+    """
+    kind = "ivf"
+
+    def __init__(self, dim=None, nlist=None, nprobe=8, train_iters=10, seed=42, dtype="float32"):
+        self.dim = dim
+        self.dtype = dtype
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iters = train_iters
+        self.seed = seed
+        self.centroids = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vectors = np.empty((0, dim or 0), dtype=dtype)
+        self.offsets = np.zeros(1, dtype=np.int64)
+
+    def __len__(self):
+        return self.ids.shape[0]
+
+    @property
+    def sizes(self):
+        return np.diff(self.offsets)
+
+    def train(self, vectors):
+        vectors = normalize(vectors)
+        n = vectors.shape[0]
+        nlist = self.nlist or max(1, int(4 * np.sqrt(n)))
+        nlist = min(nlist, n) if n else 1
+        rng = np.random.default_rng(self.seed)
+
+        sample = vectors
+        if n > 256 * nlist:
+            sample = vectors[rng.choice(n, 256 * nlist, replace=False)]
+
+        centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)] if n else np.zeros((1, vectors.shape[1]), np.float32)
+        for _ in range(self.train_iters if n else 0):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = np.bincount(assign, minlength=nlist) == 0
+            # Re-seed empty cells with random points so no centroid is wasted
+            if empty.any():
+                sums[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()))]
+            centroids = normalize(sums)
+
+        self.centroids = centroids
+        self._reset_lists()
+
+    def _reset_lists(self):
+        self.nlist, self.dim = self.centroids.shape
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vectors = np.empty((0, self.dim), dtype=self.dtype)
+        self.offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+
+    def _set_rows(self, ids, vectors, cells):
+        """Re-lays out the rows cell by cell (stable, so rows keep their order within a cell)."""
+        order = np.argsort(cells, kind="stable")
+        self.ids = ids[order]
+        self.vectors = np.ascontiguousarray(vectors[order])
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(cells, minlength=self.nlist))]).astype(np.int64)
+
+    def _row_cells(self):
+        return np.repeat(np.arange(self.nlist), self.sizes)
+
+    def build(self, vectors, ids=None, train=True):
+        """Trains the centroids (unless train=False and they exist) and adds every vector."""
+        if train or self.centroids is None:
+            self.train(vectors)
+        else:
+            self._reset_lists()
+        ids = np.arange(len(vectors), dtype=np.int64) if ids is None else ids
+        self.add(vectors, ids)
+        return self
+
+    def add(self, vectors, ids):
+        if self.centroids is None:
+            self.train(vectors)
+        vectors = normalize(vectors)
+        ids = np.asarray(ids, dtype=np.int64)
+        self.remove(ids)
+        assign = np.argmax(vectors @ self.centroids.T, axis=1)
+        self._set_rows(np.concatenate([self.ids, ids]),
+                       np.vstack([self.vectors, to_storage(vectors, self.dtype)]),
+                       np.concatenate([self._row_cells(), assign]))
+
+    def remove(self, ids):
+        keep = ~np.isin(self.ids, ids)
+        if not keep.all():
+            self._set_rows(self.ids[keep], self.vectors[keep], self._row_cells()[keep])
+
+    def search(self, query, k):
+        q = normalize(query)[0]
+        cells = top_k(self.centroids @ q, self.nprobe)
+        spans = [(self.offsets[c], self.offsets[c + 1]) for c in cells]
+        if sum(b - a for a, b in spans) < k:
+            # Not enough candidates in the probed cells: widen to every cell
+            ids, scores = self.ids, score_rows(self.vectors, q)
+        else:
+            ids = np.concatenate([self.ids[a:b] for a, b in spans])
+            scores = np.concatenate([score_rows(self.vectors[a:b], q) for a, b in spans])
+        best = top_k(scores, k)
+        return ids[best], scores[best]
+
+    def state(self):
+        return {
+            "centroids": self.centroids,
+            "sizes": self.sizes,
+            "ids": self.ids,
+            "vectors": self.vectors,
+            "nprobe": np.array(self.nprobe),
+        }
+
+    def load_state(self, state):
+        self.centroids = state["centroids"]
+        self.nlist = self.centroids.shape[0]
+        self.dim = self.centroids.shape[1]
+        self.nprobe = int(state["nprobe"])
+        self.offsets = np.concatenate([[0], np.cumsum(state["sizes"])]).astype(np.int64)
+        self.ids = state["ids"]
+        self.vectors = state["vectors"]
+        self.dtype = str(state["vectors"].dtype)
+
+
+INDEX_TYPES = {"flat": BruteForceIndex, "ivf": IVFIndex}
+
+# Below this many rows an exact scan is cheap enough
+AUTO_IVF_THRESHOLD = 50000
+
+
+def create_index(kind="auto", n_rows=0, **kwargs):
+    if kind == "auto":
+        kind = "ivf" if n_rows >= AUTO_IVF_THRESHOLD else "flat"
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown vector index type: {kind}")
+    return INDEX_TYPES[kind](**kwargs)
+
+
+# --- Persistence (stored next to the embedding store) ---
+def save_index(index, path, source_fingerprint):
+    # Per-process temp name: preforked workers may save the same index at once
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, kind=np.array(index.kind), fingerprint=np.array(source_fingerprint), **index.state())
+    os.replace(tmp, path)
+
+
+def load_index(path, source_fingerprint=None):
+    """Returns the persisted index, or None if it is missing or was built from other vectors."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            if source_fingerprint is not None and str(data["fingerprint"]) != source_fingerprint:
+                return None
+            index = INDEX_TYPES[str(data["kind"])]()
+            index.load_state({key: data[key] for key in data.files})
+            return index
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Vector index unreadable ({e}); rebuilding.")
+        return None
+
+
+def load_or_build_index(vectors, path=None, kind="auto", dtype="float32"):
+    fp = fingerprint(vectors)
+    if path:
+        index = load_index(path, fp)
+        if index is not None and (kind == "auto" or index.kind == kind) and index.dtype == dtype:
+            return index
+    index = create_index(kind, n_rows=len(vectors), dtype=dtype).build(vectors)
+    if path:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        save_index(index, path, fp)
+    return index
+
+
+def refresh_index(index, vectors, path=None):
+    """
+    A new index of the same kind/dtype over `vectors` (e.g. after a catalog reload).
+    IVF keeps its trained centroids, so only the cheap assignment step runs.
+    """
+    if index.kind == "ivf" and index.centroids is not None:
+        fresh = IVFIndex(nprobe=index.nprobe, dtype=index.dtype)
+        fresh.centroids = index.centroids
+        fresh.build(vectors, train=False)
+    else:
+        fresh = create_index(index.kind, dtype=index.dtype).build(vectors)
+    if path:
+        save_index(fresh, path, fingerprint(vectors))
+    return fresh
+
+
+# --- Recall@k vs latency reporting ---
+def evaluate_index(index, exact, queries, k=10):
+    """Compares `index` against an exact index; returns recall@k and latency percentiles (ms)."""
+    recalls, latencies = [], []
+    for q in queries:
+        truth, _ = exact.search(q, k)
+        start = time.perf_counter()
+        found, _ = index.search(q, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(np.intersect1d(truth, found)) / max(1, len(truth)))
+    latencies = np.array(latencies)
+    return {
+        "index": index.kind,
+        "rows": len(index),
+        "k": k,
+        "recall_at_k": round(float(np.mean(recalls)), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report recall@k versus latency for the vector indexes.")
+    parser.add_argument("--rows", type=int, default=100000, help="Synthetic rows (ignored with --store)")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--store", action="store_true", help="Use the vectors in the embedding store")
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16", "int8"])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.store:
+        from embedding_store import EmbeddingStore
+        _, vectors = EmbeddingStore().load()
+        if vectors is None:
+            raise SystemExit("No embedding store found; run `python embedding_store.py build` first.")
+        vectors = np.asarray(vectors)
+    else:
+        # Clustered synthetic data behaves more like real embeddings than uniform noise
+        centers = rng.normal(size=(256, args.dim))
+        vectors = centers[rng.integers(0, 256, args.rows)] + 0.5 * rng.normal(size=(args.rows, args.dim))
+    vectors = normalize(vectors)
+    queries = normalize(vectors[rng.choice(len(vectors), args.queries)] + 0.1 * rng.normal(size=(args.queries, vectors.shape[1])))
+
+    exact = BruteForceIndex().build(vectors)
+    print(evaluate_index(exact, exact, queries, args.k))
+    if args.dtype != "float32":
+        # Same exact scan over low-precision rows: recall shows the quantization loss
+        report = evaluate_index(BruteForceIndex(dtype=args.dtype).build(vectors), exact, queries, args.k)
+        report["dtype"] = args.dtype
+        print(report)
+
+    start = time.perf_counter()
+    ivf = IVFIndex(dtype=args.dtype).build(vectors)
+    print(f"IVF trained with nlist={ivf.nlist} in {time.perf_counter() - start:.1f}s")
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        report = evaluate_index(ivf, exact, queries, args.k)
+        report["nprobe"] = nprobe
+        print(report)
+
+
+if __name__ == "__main__":
+    main()